@@ -3,7 +3,7 @@ import os
 from logging.config import fileConfig
 
 from dotenv import load_dotenv
-from sqlalchemy import engine_from_config
+from sqlalchemy import Column, engine_from_config
 from sqlalchemy import pool
 from sqlalchemy.ext.asyncio import AsyncEngine
 from alembic import context
@@ -36,6 +36,16 @@ target_metadata = Base.metadata
 # ... etc.
 
 
+def include_object(obj, name, type_, reflected, compare_to):
+    """Пропускает индексы по выражениям: Alembic не отражает их из БД.
+
+    Миграции для таких индексов пишутся вручную.
+    """
+    if type_ == 'index' and not reflected:
+        return all(isinstance(expr, Column) for expr in obj.expressions)
+    return True
+
+
 def run_migrations_offline():
     """Run migrations in 'offline' mode.
 
@@ -65,6 +75,7 @@ def do_run_migrations(connection):
         connection=connection,
         target_metadata=target_metadata,
         render_as_batch=True,
+        include_object=include_object,
     )
 
     with context.begin_transaction():
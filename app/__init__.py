@@ -0,0 +1,2 @@
+# Отсчёт времени запуска начинается с импорта пакета.
+from app.core.boot import boot_report  # noqa
@@ -1,12 +1,27 @@
-from fastapi import APIRouter, Depends
+from typing import List, Optional
+
+from fastapi import APIRouter, Body, Depends, Request, Response, status
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from app.api.endpoints.utils import get_project_or_404
+from app.api.endpoints.utils import (
+    PageParams,
+    ProjectFilterParams,
+    fields_param,
+    get_project_or_404,
+    ids_param,
+    json_response,
+    list_etag,
+    not_modified,
+    rows_response,
+)
+from app.core.config import settings
+from app.core.constants import ALLOCATION_MODE_BACKGROUND, BATCH_MAX_SIZE
 from app.core.db import get_async_session
 from app.crud import charity_project_crud
 from app.services.charity_project import CharityProjectService
 from app.models import Donation
 from app.schemas import (
+    AllocationStatus,
     CharityProjectCreate,
     CharityProjectDB,
     CharityProjectUpdate,
@@ -24,23 +39,131 @@ router = APIRouter()
 )
 async def create_new_charity_project(
     project: CharityProjectCreate,
+    response: Response,
     session: AsyncSession = Depends(get_async_session),
 ):
-    """Только для суперюзеров."""
+    """Только для суперюзеров.
+
+    В фоновом режиме распределения отвечает 202, ход распределения
+    доступен по `/charity_project/{project_id}/allocation`.
+    """
+    if settings.allocation_mode == ALLOCATION_MODE_BACKGROUND:
+        response.status_code = status.HTTP_202_ACCEPTED
     return await CharityProjectService.create_charity_project(
         project, Donation, session
     )
 
 
+@router.post(
+    '/batch',
+    response_model=List[CharityProjectDB],
+    response_model_exclude_none=True,
+    dependencies=[Depends(current_superuser)],
+)
+async def create_new_charity_projects(
+    response: Response,
+    projects: List[CharityProjectCreate] = Body(
+        ..., min_items=1, max_items=BATCH_MAX_SIZE
+    ),
+    session: AsyncSession = Depends(get_async_session),
+):
+    """Только для суперюзеров.
+
+    Создаёт пачку проектов в порядке их следования в запросе.
+    """
+    if settings.allocation_mode == ALLOCATION_MODE_BACKGROUND:
+        response.status_code = status.HTTP_202_ACCEPTED
+    return await CharityProjectService.create_charity_projects(
+        projects, Donation, session
+    )
+
+
 @router.get(
     '/',
     response_model=list[CharityProjectDB],
     response_model_exclude_none=True,
 )
 async def get_all_charity_projects(
+    request: Request,
+    page: PageParams = Depends(),
+    fields: Optional[List[str]] = Depends(fields_param(CharityProjectDB)),
+    filters: ProjectFilterParams = Depends(),
+    ids: Optional[List[int]] = Depends(ids_param),
+    session: AsyncSession = Depends(get_async_session),
+):
+    """Проекты по фильтрам, по умолчанию по возрастанию id.
+
+    Остаток -- это `full_amount - invested_amount`, в `ordering` можно
+    указать `id`, `create_date` или `remaining`, минус перед ключом
+    задаёт убывающий порядок. Если есть следующая страница, её курсор
+    передаётся в заголовке `X-Next-Cursor`. В `fields` можно
+    перечислить нужные поля. С `ids` возвращаются проекты с этими id
+    в порядке запроса, фильтры и страницы не учитываются.
+
+    Ответ содержит `ETag`, с совпадающим `If-None-Match` вернётся 304.
+    """
+    if ids is not None:
+        etag = list_etag(
+            await CharityProjectService.get_charity_projects_version(session),
+            request,
+        )
+        unchanged = not_modified(request, etag)
+        if unchanged is not None:
+            return unchanged
+        projects, missing_ids = (
+            await CharityProjectService.get_charity_projects_by_ids(
+                ids, session, fields
+            )
+        )
+        return rows_response(
+            projects, exclude_none=True, missing_ids=missing_ids, etag=etag
+        )
+    listing = CharityProjectService.get_cached_charity_projects_listing(
+        page.limit, page.cursor, fields, **vars(filters)
+    )
+    if listing is None:
+        unchanged = not_modified(request, list_etag(
+            await CharityProjectService.get_charity_projects_version(session),
+            request,
+        ))
+        if unchanged is not None:
+            return unchanged
+        listing = await CharityProjectService.get_charity_projects_listing(
+            session, page.limit, page.cursor, fields, **vars(filters)
+        )
+    body, next_cursor, version = listing
+    etag = list_etag(version, request)
+    unchanged = not_modified(request, etag)
+    if unchanged is not None:
+        return unchanged
+    return json_response(body, next_cursor, etag=etag)
+
+
+@router.get(
+    '/{project_id}',
+    response_model=CharityProjectDB,
+    response_model_exclude_none=True,
+)
+async def get_charity_project(
+    project_id: int,
     session: AsyncSession = Depends(get_async_session),
 ):
-    return await CharityProjectService.get_all_charity_projects(session)
+    project = await CharityProjectService.get_charity_project(
+        project_id, session
+    )
+    return await get_project_or_404(project)
+
+
+@router.get(
+    '/{project_id}/allocation',
+    response_model=AllocationStatus,
+)
+async def get_charity_project_allocation(
+    project_id: int,
+    session: AsyncSession = Depends(get_async_session),
+):
+    project = await charity_project_crud.get(project_id, session)
+    return await get_project_or_404(project)
 
 
 @router.patch(
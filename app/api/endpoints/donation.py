@@ -1,10 +1,32 @@
-from typing import List
+from typing import List, Optional
 
-from fastapi import APIRouter, Depends
+from fastapi import (
+    APIRouter, Body, Depends, HTTPException, Query, Request, Response, status
+)
+from fastapi.responses import StreamingResponse
 from sqlalchemy.ext.asyncio import AsyncSession
 
+from app.api.endpoints.utils import (
+    PageParams,
+    fields_param,
+    get_donation_or_404,
+    ids_param,
+    list_etag,
+    not_modified,
+    rows_response,
+)
+from app.core.config import settings
+from app.core.constants import (
+    ALLOCATION_MODE_BACKGROUND,
+    BATCH_MAX_SIZE,
+    EXPORT_FORMAT_JSON,
+    EXPORT_FORMAT_NDJSON,
+    EXPORT_MEDIA_TYPES,
+)
 from app.core.db import get_async_session
+from app.crud import donation_crud
 from app.services.donation import DonationService
+from app.schemas import AllocationStatus
 from app.schemas.donation import DonationCreate, DonationDB, DonationBase
 from app.core.user import current_user, current_superuser
 from app.models import CharityProject, User
@@ -19,14 +41,38 @@ router = APIRouter()
 )
 async def create_donation(
     donation: DonationBase,
+    response: Response,
     session: AsyncSession = Depends(get_async_session),
     user: User = Depends(current_user),
 ):
+    if settings.allocation_mode == ALLOCATION_MODE_BACKGROUND:
+        response.status_code = status.HTTP_202_ACCEPTED
     return await DonationService.create_donation(
         donation, CharityProject, session, user
     )
 
 
+@router.post(
+    '/batch',
+    response_model=List[DonationCreate],
+    response_model_exclude_none=True,
+)
+async def create_donations(
+    response: Response,
+    donations: List[DonationBase] = Body(
+        ..., min_items=1, max_items=BATCH_MAX_SIZE
+    ),
+    session: AsyncSession = Depends(get_async_session),
+    user: User = Depends(current_user),
+):
+    """Создаёт пачку пожертвований в порядке их следования в запросе."""
+    if settings.allocation_mode == ALLOCATION_MODE_BACKGROUND:
+        response.status_code = status.HTTP_202_ACCEPTED
+    return await DonationService.create_donations(
+        donations, CharityProject, session, user
+    )
+
+
 @router.get(
     '/',
     response_model=List[DonationDB],
@@ -34,10 +80,59 @@ async def create_donation(
     dependencies=[Depends(current_superuser)],
 )
 async def get_all_donations(
+    request: Request,
+    page: PageParams = Depends(),
+    fields: Optional[List[str]] = Depends(fields_param(DonationDB)),
+    ids: Optional[List[int]] = Depends(ids_param),
     session: AsyncSession = Depends(get_async_session),
 ):
-    """Только для суперюзеров."""
-    return await DonationService.get_all_donations(session)
+    """Только для суперюзеров.
+
+    Курсор следующей страницы передаётся в заголовке `X-Next-Cursor`.
+    В `fields` можно перечислить нужные поля. С `ids` возвращаются
+    пожертвования с этими id в порядке запроса без разбиения на страницы.
+    Ответ содержит `ETag`, с совпадающим `If-None-Match` вернётся 304.
+    """
+    version = await DonationService.get_donations_version(session)
+    etag = list_etag(version, request)
+    unchanged = not_modified(request, etag)
+    if unchanged is not None:
+        return unchanged
+    if ids is not None:
+        donations, missing_ids = await DonationService.get_donations_by_ids(
+            ids, session, fields
+        )
+        return rows_response(
+            donations, exclude_none=True, missing_ids=missing_ids, etag=etag
+        )
+    donations, next_cursor = await DonationService.get_all_donations(
+        session, page.limit, page.cursor, fields, version
+    )
+    return rows_response(donations, next_cursor, exclude_none=True, etag=etag)
+
+
+@router.get(
+    '/export',
+    response_class=StreamingResponse,
+    dependencies=[Depends(current_superuser)],
+)
+async def export_donations(
+    export_format: str = Query(
+        EXPORT_FORMAT_NDJSON,
+        alias='format',
+        regex=f'^({EXPORT_FORMAT_NDJSON}|{EXPORT_FORMAT_JSON})$',
+    ),
+    session: AsyncSession = Depends(get_async_session),
+):
+    """Только для суперюзеров.
+
+    Выгружает все пожертвования потоком в формате `ndjson` (по объекту
+    на строку) или `json` (массив), не собирая их в памяти целиком.
+    """
+    return StreamingResponse(
+        DonationService.export_donations(session, export_format),
+        media_type=EXPORT_MEDIA_TYPES[export_format],
+    )
 
 
 @router.get(
@@ -46,8 +141,65 @@ async def get_all_donations(
     response_model_exclude={'user_id'},
 )
 async def get_my_donations(
+    request: Request,
+    page: PageParams = Depends(),
+    fields: Optional[List[str]] = Depends(fields_param(DonationCreate)),
+    user: User = Depends(current_user),
+    session: AsyncSession = Depends(get_async_session),
+):
+    """Получает список всех пожертвований для текущего пользователя.
+
+    Курсор следующей страницы передаётся в заголовке `X-Next-Cursor`.
+    В `fields` можно перечислить нужные поля. Ответ содержит `ETag`,
+    с совпадающим `If-None-Match` вернётся 304.
+    """
+    version = await DonationService.get_user_donations_version(
+        user, session
+    )
+    etag = list_etag(version, request)
+    unchanged = not_modified(request, etag)
+    if unchanged is not None:
+        return unchanged
+    donations, next_cursor = await DonationService.get_user_donations(
+        user, session, page.limit, page.cursor, fields, version
+    )
+    return rows_response(donations, next_cursor, etag=etag)
+
+
+@router.get(
+    '/{donation_id}/allocation',
+    response_model=AllocationStatus,
+)
+async def get_donation_allocation(
+    donation_id: int,
     user: User = Depends(current_user),
     session: AsyncSession = Depends(get_async_session),
 ):
-    """Получает список всех пожертвований для текущего пользователя."""
-    return await DonationService.get_user_donations(user, session)
+    """Доступно владельцу пожертвования и суперюзерам."""
+    donation = await donation_crud.get(donation_id, session)
+    return await get_donation_or_404(donation, user)
+
+
+@router.get(
+    '/{donation_id}',
+    response_model=DonationDB,
+    response_model_exclude_none=True,
+)
+async def get_donation(
+    donation_id: int,
+    user: User = Depends(current_user),
+    session: AsyncSession = Depends(get_async_session),
+):
+    """Доступно владельцу пожертвования и суперюзерам."""
+    donation = await DonationService.get_donation(donation_id, session)
+    return await get_donation_or_404(donation, user)
+
+
+@router.api_route(
+    '/{donation_id}',
+    methods=['PATCH', 'DELETE'],
+    include_in_schema=False,
+)
+async def change_donation(donation_id: int):
+    """Пожертвования нельзя изменять и удалять."""
+    raise HTTPException(status_code=status.HTTP_404_NOT_FOUND)
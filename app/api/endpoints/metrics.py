@@ -0,0 +1,23 @@
+from fastapi import APIRouter, Depends
+
+from app.core.boot import boot_report
+from app.core.user import current_superuser, user_cache
+from app.services.cache import listing_cache, object_cache, read_flights
+
+router = APIRouter()
+
+
+@router.get('/metrics', dependencies=[Depends(current_superuser)])
+async def get_metrics():
+    """Только для суперюзеров.
+
+    Счётчики кешей, доля чтений, объединённых с уже идущими, и время
+    этапов запуска.
+    """
+    return {
+        'object_cache': object_cache.stats(),
+        'listing_cache': listing_cache.stats(),
+        'read_flights': read_flights.stats(),
+        'user_cache': user_cache.stats(),
+        'boot': boot_report.stats(),
+    }
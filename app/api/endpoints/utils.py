@@ -1,6 +1,159 @@
-from fastapi import HTTPException, status
+import hashlib
+from datetime import datetime
+from typing import Callable, List, Optional, Sequence, Type
 
-from app.models import CharityProject
+from fastapi import HTTPException, Query, Request, Response, status
+from pydantic import BaseModel
+from sqlalchemy.engine import Row
+
+from app.core.constants import (
+    ETAG_HEADER,
+    MISSING_IDS_HEADER,
+    NEXT_CURSOR_HEADER,
+    PAGE_DEFAULT_LIMIT,
+    PAGE_MAX_LIMIT,
+    PROJECT_ORDERING_ID,
+    PROJECT_ORDERINGS,
+)
+from app.core.serialization import dumps_rows
+from app.models import CharityProject, Donation, User
+
+
+class PageParams:
+    """Параметры страницы списка: размер и курсор из `X-Next-Cursor`."""
+
+    def __init__(
+        self,
+        limit: int = Query(PAGE_DEFAULT_LIMIT, ge=1, le=PAGE_MAX_LIMIT),
+        cursor: Optional[str] = None,
+    ):
+        self.limit = limit
+        self.cursor = cursor
+
+
+class ProjectFilterParams:
+    """Фильтры и порядок списка проектов."""
+
+    def __init__(
+        self,
+        fully_invested: Optional[bool] = None,
+        min_remaining: Optional[int] = Query(None, ge=0),
+        max_remaining: Optional[int] = Query(None, ge=0),
+        created_after: Optional[datetime] = None,
+        created_before: Optional[datetime] = None,
+        ordering: str = Query(
+            PROJECT_ORDERING_ID,
+            regex=f'^-?({"|".join(PROJECT_ORDERINGS)})$',
+        ),
+    ):
+        self.fully_invested = fully_invested
+        self.min_remaining = min_remaining
+        self.max_remaining = max_remaining
+        self.created_after = created_after
+        self.created_before = created_before
+        self.ordering = ordering
+
+
+def fields_param(schema: Type[BaseModel]) -> Callable:
+    """Зависимость с полями schema из параметра `fields` через запятую."""
+
+    def get_fields(
+        fields: Optional[str] = Query(
+            None,
+            description='Поля ответа через запятую, `id` выводится всегда.',
+        ),
+    ) -> Optional[List[str]]:
+        if fields is None:
+            return None
+        names = [name.strip() for name in fields.split(',') if name.strip()]
+        unknown = [name for name in names if name not in schema.__fields__]
+        if not names or unknown:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail='Неизвестные поля: '
+                f'{", ".join(unknown) or fields}. Доступные поля: '
+                f'{", ".join(schema.__fields__)}.',
+            )
+        return names
+
+    return get_fields
+
+
+def ids_param(
+    ids: Optional[str] = Query(
+        None,
+        regex=r'^\d+(,\d+)*$',
+        description='id объектов через запятую. Ненайденные id '
+        'передаются в заголовке `X-Missing-Ids`.',
+    ),
+) -> Optional[List[int]]:
+    if ids is None:
+        return None
+    obj_ids = list(dict.fromkeys(int(obj_id) for obj_id in ids.split(',')))
+    if len(obj_ids) > PAGE_MAX_LIMIT:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f'Можно запросить не больше {PAGE_MAX_LIMIT} объектов!',
+        )
+    return obj_ids
+
+
+def set_next_cursor(response: Response, next_cursor: Optional[str]) -> None:
+    if next_cursor is not None:
+        response.headers[NEXT_CURSOR_HEADER] = next_cursor
+
+
+def list_etag(version: str, request: Request) -> str:
+    """ETag списка из версии данных и параметров запроса."""
+    digest = hashlib.blake2b(
+        f'{version}?{request.url.query}'.encode(), digest_size=16
+    )
+    return f'"{digest.hexdigest()}"'
+
+
+def not_modified(request: Request, etag: str) -> Optional[Response]:
+    """Ответ 304, если etag есть в заголовке `If-None-Match`."""
+    if_none_match = request.headers.get('If-None-Match')
+    if if_none_match is None:
+        return None
+    etags = {
+        tag.strip().removeprefix('W/') for tag in if_none_match.split(',')
+    }
+    if etag not in etags and '*' not in etags:
+        return None
+    return Response(
+        status_code=status.HTTP_304_NOT_MODIFIED,
+        headers={ETAG_HEADER: etag},
+    )
+
+
+def rows_response(
+    rows: List[Row],
+    next_cursor: Optional[str] = None,
+    exclude_none: bool = False,
+    missing_ids: Sequence[int] = (),
+    etag: Optional[str] = None,
+) -> Response:
+    """JSON-массив строк без проверки через response_model."""
+    return json_response(
+        dumps_rows(rows, exclude_none), next_cursor, missing_ids, etag
+    )
+
+
+def json_response(
+    body: bytes,
+    next_cursor: Optional[str] = None,
+    missing_ids: Sequence[int] = (),
+    etag: Optional[str] = None,
+) -> Response:
+    """Ответ с готовым JSON и заголовками страницы."""
+    response = Response(body, media_type='application/json')
+    set_next_cursor(response, next_cursor)
+    if missing_ids:
+        response.headers[MISSING_IDS_HEADER] = ','.join(map(str, missing_ids))
+    if etag is not None:
+        response.headers[ETAG_HEADER] = etag
+    return response
 
 
 async def get_project_or_404(project: CharityProject) -> CharityProject:
@@ -10,3 +163,16 @@ async def get_project_or_404(project: CharityProject) -> CharityProject:
             detail='Целевой проект не найден!',
         )
     return project
+
+
+async def get_donation_or_404(
+    donation: Donation, user: User
+) -> Donation:
+    if not donation or (
+        donation.user_id != user.id and not user.is_superuser
+    ):
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail='Пожертвование не найдено!',
+        )
+    return donation
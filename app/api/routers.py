@@ -3,6 +3,7 @@ from fastapi import APIRouter
 from app.api.endpoints import (
     charity_project_router,
     donation_router,
+    metrics_router,
     user_router,
 )
 
@@ -15,4 +16,5 @@ main_router.include_router(
 main_router.include_router(
     donation_router, prefix='/donation', tags=['Donations']
 )
+main_router.include_router(metrics_router, tags=['Metrics'])
 main_router.include_router(user_router)
@@ -0,0 +1,60 @@
+import time
+from contextlib import contextmanager
+from typing import Dict, Iterator, Optional
+
+
+class BootReport:
+    """Время запуска приложения по этапам.
+
+    Отсчёт идёт с импорта пакета app. mark() записывает время с
+    предыдущей отметки, measure() -- время блока внутри этапа, finish()
+    фиксирует общее время запуска.
+    """
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self._last_mark = self.started
+        self._finished: Optional[float] = None
+        self.stages: Dict[str, float] = {}
+
+    def mark(self, stage: str) -> None:
+        now = time.perf_counter()
+        self.stages[stage] = now - self._last_mark
+        self._last_mark = now
+
+    @contextmanager
+    def measure(self, stage: str) -> Iterator[None]:
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.stages[stage] = time.perf_counter() - started
+
+    def finish(self) -> None:
+        self._finished = time.perf_counter()
+
+    @property
+    def total(self) -> float:
+        """Время запуска, до вызова finish() -- время с начала отсчёта."""
+        if self._finished is None:
+            return time.perf_counter() - self.started
+        return self._finished - self.started
+
+    def check_budget(self, budget: Optional[float]) -> None:
+        if budget is not None and self.total > budget:
+            raise RuntimeError(
+                f'Запуск приложения превысил бюджет {budget} с. {self}'
+            )
+
+    def stats(self) -> Dict[str, float]:
+        return {'total': self.total, **self.stages}
+
+    def __str__(self) -> str:
+        stages = ', '.join(
+            f'{stage} {seconds * 1000:.0f} мс'
+            for stage, seconds in self.stages.items()
+        )
+        return f'Запуск за {self.total * 1000:.0f} мс: {stages}.'
+
+
+boot_report = BootReport()
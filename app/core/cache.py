@@ -0,0 +1,78 @@
+import time
+import uuid
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, Optional, Tuple
+
+
+class TTLCache:
+    """Кеш значений в памяти процесса с ограниченным сроком жизни.
+
+    clear() увеличивает поколение кеша. Значение, прочитанное из БД до
+    очистки, не сохраняется: set() с устаревшим поколением ничего не
+    делает. Нулевой ttl отключает кеш. Если задан maxsize, при
+    переполнении вытесняется значение, которое дольше всех не читали.
+    """
+
+    def __init__(self, ttl: float = 0, maxsize: Optional[int] = None):
+        self.ttl = ttl
+        self.maxsize = maxsize
+        self.generation = 0
+        self.hits = 0
+        self.misses = 0
+        self._values: 'OrderedDict[Hashable, Tuple[float, Any]]' = (
+            OrderedDict()
+        )
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        if self.ttl <= 0:
+            return None
+        item = self._values.get(key)
+        if item is None:
+            self.misses += 1
+            return None
+        expires_at, value = item
+        if expires_at < time.monotonic():
+            del self._values[key]
+            self.misses += 1
+            return None
+        self._values.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def set(self, key: Hashable, value: Any, generation: int) -> None:
+        if self.ttl <= 0 or generation != self.generation:
+            return
+        self._values[key] = (time.monotonic() + self.ttl, value)
+        self._values.move_to_end(key)
+        if self.maxsize is not None and len(self._values) > self.maxsize:
+            self._values.popitem(last=False)
+
+    def clear(self) -> None:
+        self.generation += 1
+        self._values.clear()
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'size': len(self._values),
+            'generation': self.generation,
+        }
+
+
+class WriteGeneration:
+    """Номер записи в БД через приложение в пределах процесса.
+
+    boot_id отличает процессы и перезапуски, поэтому номера из разных
+    процессов не совпадают.
+    """
+
+    def __init__(self):
+        self.boot_id = uuid.uuid4().hex
+        self.value = 0
+
+    def bump(self) -> None:
+        self.value += 1
+
+    def __str__(self) -> str:
+        return f'{self.boot_id}.{self.value}'
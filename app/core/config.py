@@ -2,6 +2,8 @@ from typing import Optional
 
 from pydantic import BaseSettings, EmailStr
 
+from app.core.constants import ALLOCATION_ENGINE_ORM, ALLOCATION_MODE_SYNC
+
 
 class Settings(BaseSettings):
     app_title: str = 'QRKot'
@@ -11,6 +13,20 @@ class Settings(BaseSettings):
     secret: str = None
     first_superuser_email: Optional[EmailStr] = None
     first_superuser_password: Optional[str] = None
+    allocation_chunk_size: int = 100
+    allocation_engine: str = ALLOCATION_ENGINE_ORM
+    allocation_mode: str = ALLOCATION_MODE_SYNC
+    allocation_poll_interval: float = 1.0
+    group_commit: bool = False
+    group_commit_max_batch_size: int = 100
+    object_cache_ttl: float = 0
+    listing_cache_ttl: float = 0
+    listing_cache_maxsize: int = 1000
+    user_cache_ttl: float = 0
+    user_cache_maxsize: int = 10000
+    password_hash_workers: int = 4
+    jwt_claims: bool = False
+    boot_budget: Optional[float] = None
 
     class Config:
         env_file = '.env'
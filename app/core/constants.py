@@ -2,3 +2,31 @@ CHARITY_PROJECT_NAME_MAX_LEN = 100
 CHARITY_PROJECT_MIN_ANYSTR_LEN = 1
 INVESTED_AMOUNT_DEFAULT = 0
 INVESTED_AMOUNT_TO_PROHIBIT_DELETION = 0
+ALLOCATION_ENGINE_ORM = 'orm'
+ALLOCATION_ENGINE_SQL = 'sql'
+ALLOCATION_ENGINE_LEDGER = 'ledger'
+ALLOCATION_MODE_SYNC = 'sync'
+ALLOCATION_MODE_BACKGROUND = 'background'
+BATCH_MAX_SIZE = 1000
+PAGE_DEFAULT_LIMIT = 100
+PAGE_MAX_LIMIT = 1000
+NEXT_CURSOR_HEADER = 'X-Next-Cursor'
+MISSING_IDS_HEADER = 'X-Missing-Ids'
+ETAG_HEADER = 'ETag'
+EXPORT_FORMAT_NDJSON = 'ndjson'
+EXPORT_FORMAT_JSON = 'json'
+EXPORT_MEDIA_TYPES = {
+    EXPORT_FORMAT_NDJSON: 'application/x-ndjson',
+    EXPORT_FORMAT_JSON: 'application/json',
+}
+EXPORT_CHUNK_SIZE = 1000
+PROJECT_ORDERING_ID = 'id'
+PROJECT_ORDERING_CREATE_DATE = 'create_date'
+PROJECT_ORDERING_REMAINING = 'remaining'
+PROJECT_ORDERINGS = (
+    PROJECT_ORDERING_ID,
+    PROJECT_ORDERING_CREATE_DATE,
+    PROJECT_ORDERING_REMAINING,
+)
+JWT_USER_CLAIMS = ('email', 'is_active', 'is_superuser', 'is_verified')
+PROVISION_BATCH_SIZE = 1000
@@ -1,9 +1,15 @@
-from sqlalchemy import Column, Integer
+from contextlib import asynccontextmanager
+from typing import Optional
+from sqlalchemy import Column, Integer, inspect, select
 from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
 from sqlalchemy.orm import declarative_base, declared_attr, sessionmaker
+from sqlalchemy.orm.attributes import set_committed_value
 
+from app.core.boot import boot_report
 from app.core.config import settings
 
+UNIT_OF_WORK_KEY = 'unit_of_work'
+
 
 class PreBase:
 
@@ -15,10 +21,94 @@ class PreBase:
 
 
 Base = declarative_base(cls=PreBase)
-engine = create_async_engine(settings.database_url)
+with boot_report.measure('engine'):
+    engine = create_async_engine(settings.database_url)
 AsyncSessionLocal = sessionmaker(engine, class_=AsyncSession)
 
 
 async def get_async_session():
     async with AsyncSessionLocal() as async_session:
         yield async_session
+
+
+def in_unit_of_work(session: AsyncSession) -> bool:
+    return UNIT_OF_WORK_KEY in session.info
+
+
+@asynccontextmanager
+async def unit_of_work(session: AsyncSession):
+    """Одна транзакция с одним коммитом для всех записей внутри блока.
+
+    Внутри блока save_changes только сбрасывает изменения в БД. Коммит
+    выполняется при выходе из внешнего блока, при ошибке, в том числе
+    при ошибке коммита, транзакция откатывается.
+    """
+    if in_unit_of_work(session):
+        yield session
+        return
+    saved = session.info[UNIT_OF_WORK_KEY] = []
+    try:
+        yield session
+        del session.info[UNIT_OF_WORK_KEY]
+        await commit(session, saved)
+    except BaseException:
+        session.info.pop(UNIT_OF_WORK_KEY, None)
+        await session.rollback()
+        raise
+
+
+async def save_changes(session: AsyncSession, *objs) -> None:
+    """Коммитит изменения objs, в unit_of_work -- только flush."""
+    if in_unit_of_work(session):
+        session.info[UNIT_OF_WORK_KEY].extend(objs)
+        await session.flush()
+        return
+    await commit(session, objs)
+
+
+async def commit(session: AsyncSession, objs) -> None:
+    """Коммитит сессию, сохраняя objs загруженными без повторного SELECT.
+
+    Записанные значения колонок берутся из объектов после flush.
+    Значения, которые генерирует сервер, попадают туда через RETURNING
+    (eager_defaults) на СУБД, которые его поддерживают. Объекты, у
+    которых такие колонки остались незагруженными, перечитываются.
+    """
+    await session.flush()
+    snapshots = [(obj, _snapshot(obj)) for obj in dict.fromkeys(objs)]
+    await session.commit()
+    stale = []
+    for obj, snapshot in snapshots:
+        if snapshot is None:
+            stale.append(obj)
+            continue
+        for key, value in snapshot.items():
+            set_committed_value(obj, key, value)
+    await refresh_objects(stale, session)
+
+
+def _snapshot(obj) -> Optional[dict]:
+    """Значения колонок объекта или None, если часть из них не загружена.
+
+    У созданного в этой сессии объекта колонки, не попавшие в INSERT и
+    не истёкшие после него, в БД равны NULL.
+    """
+    state = inspect(obj)
+    keys = [attr.key for attr in state.mapper.column_attrs]
+    missing = set(keys).difference(state.dict)
+    if missing and (
+        state.load_path.path or state.expired_attributes & missing
+    ):
+        return None
+    return {key: state.dict.get(key) for key in keys}
+
+
+async def refresh_objects(objs, session: AsyncSession) -> None:
+    """Перечитывает истёкшие объекты одним запросом на каждую модель."""
+    ids_by_model = {}
+    for obj in objs:
+        ids_by_model.setdefault(type(obj), set()).add(
+            inspect(obj).identity[0]
+        )
+    for model, ids in ids_by_model.items():
+        await session.execute(select(model).where(model.id.in_(ids)))
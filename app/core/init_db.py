@@ -1,11 +1,22 @@
 import contextlib
+import os
+from concurrent.futures import ProcessPoolExecutor
+from typing import Iterable, Optional, Tuple
 
-from fastapi_users.exceptions import UserAlreadyExists
-from pydantic import EmailStr
+from fastapi_users.exceptions import (
+    InvalidPasswordException,
+    UserAlreadyExists,
+)
+from fastapi_users_db_sqlalchemy import SQLAlchemyUserDatabase
+from pydantic import EmailStr, ValidationError
+from sqlalchemy import func, insert, select
 
 from app.core.config import settings
-from app.core.db import get_async_session
-from app.core.user import get_user_db, get_user_manager
+from app.core.constants import PROVISION_BATCH_SIZE
+from app.core.db import AsyncSessionLocal, get_async_session
+from app.core.password import hash_password
+from app.core.user import UserManager, get_user_db, get_user_manager
+from app.models import User
 from app.schemas.user import UserCreate
 
 get_async_session_context = contextlib.asynccontextmanager(get_async_session)
@@ -31,10 +42,91 @@ async def create_user(
         pass
 
 
+async def create_users(
+    users: Iterable[dict],
+    processes: Optional[int] = None,
+    batch_size: int = PROVISION_BATCH_SIZE,
+    session_factory=AsyncSessionLocal,
+) -> Tuple[int, int]:
+    """Создаёт пользователей пачками, пропуская уже существующие e-mail.
+
+    Пароли хешируются в пуле из processes процессов (по умолчанию по
+    числу ядер), пользователи вставляются через executemany в одной
+    транзакции. Возвращает число созданных и пропущенных пользователей.
+    """
+    async with session_factory() as session:
+        user_manager = UserManager(SQLAlchemyUserDatabase(session, User))
+        users_by_email = {}
+        skipped = 0
+        for number, user in enumerate(users, start=1):
+            try:
+                user_create = UserCreate(**user)
+                await user_manager.validate_password(
+                    user_create.password, user_create
+                )
+            except (ValidationError, InvalidPasswordException) as error:
+                raise ValueError(
+                    f'Некорректный пользователь №{number}: '
+                    f'{getattr(error, "reason", error)}'
+                )
+            if user_create.email.lower() in users_by_email:
+                skipped += 1
+                continue
+            users_by_email[user_create.email.lower()] = user_create
+        emails = list(users_by_email)
+        for start in range(0, len(emails), batch_size):
+            existing = await session.execute(
+                select(func.lower(User.email)).where(
+                    func.lower(User.email).in_(
+                        emails[start:start + batch_size]
+                    )
+                )
+            )
+            for email in existing.scalars():
+                if users_by_email.pop(email, None) is not None:
+                    skipped += 1
+        new_users = list(users_by_email.values())
+        processes = processes or os.cpu_count()
+        with ProcessPoolExecutor(processes) as pool:
+            hashed_passwords = pool.map(
+                hash_password,
+                [user.password for user in new_users],
+                chunksize=max(1, len(new_users) // (processes * 4)),
+            )
+            rows = [
+                {
+                    **user.dict(exclude={'password'}),
+                    'hashed_password': hashed_password,
+                }
+                for user, hashed_password in zip(new_users, hashed_passwords)
+            ]
+        for start in range(0, len(rows), batch_size):
+            await session.execute(
+                insert(User), rows[start:start + batch_size]
+            )
+        await session.commit()
+    return len(rows), skipped
+
+
+async def user_exists(email: EmailStr) -> bool:
+    """Есть ли пользователь с email, поиском по индексу ix_user_email."""
+    async with AsyncSessionLocal() as session:
+        exists = await session.execute(
+            select(User.id).where(User.email == email)
+        )
+        return exists.first() is not None
+
+
 async def create_first_superuser():
+    """Создаёт суперпользователя из настроек, если его ещё нет.
+
+    Существование проверяется одним запросом до создания менеджера
+    пользователей и хеширования пароля.
+    """
     if (
         settings.first_superuser_email is not None and
-            settings.first_superuser_password is not None
+            settings.first_superuser_password is not None and
+            not await user_exists(settings.first_superuser_email)
     ):
         await create_user(
             email=settings.first_superuser_email,
@@ -0,0 +1,51 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Optional, Tuple
+
+from fastapi_users.password import PasswordHelper
+
+
+_password_helper = PasswordHelper()
+
+
+def hash_password(password: str) -> str:
+    """Хеш пароля bcrypt для пула процессов."""
+    return _password_helper.hash(password)
+
+
+class ThreadPoolPasswordHelper(PasswordHelper):
+    """Хеширование и проверка паролей bcrypt в пуле потоков.
+
+    bcrypt отпускает GIL, поэтому цикл событий продолжает обслуживать
+    другие запросы. Одновременно выполняется не больше max_workers
+    хеширований, остальные ждут в очереди пула.
+    """
+
+    def __init__(self, max_workers: int):
+        super().__init__()
+        self.max_workers = max_workers
+        self._executor: Optional[ThreadPoolExecutor] = None
+
+    async def _run(self, func: Callable, *args) -> Any:
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(
+                self.max_workers, thread_name_prefix='password'
+            )
+        return await asyncio.get_running_loop().run_in_executor(
+            self._executor, func, *args
+        )
+
+    async def hash_async(self, password: str) -> str:
+        return await self._run(self.hash, password)
+
+    async def verify_and_update_async(
+        self, plain_password: str, hashed_password: str
+    ) -> Tuple[bool, Optional[str]]:
+        return await self._run(
+            self.verify_and_update, plain_password, hashed_password
+        )
+
+    def shutdown(self) -> None:
+        if self._executor is not None:
+            self._executor.shutdown()
+            self._executor = None
@@ -0,0 +1,61 @@
+import json
+from datetime import datetime
+from typing import Iterable, List, Optional, Type
+
+from pydantic import BaseModel
+from sqlalchemy import Column
+from sqlalchemy.engine import Row
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+def schema_columns(
+    model,
+    schema: Type[BaseModel],
+    exclude: Iterable[str] = (),
+    fields: Optional[Iterable[str]] = None,
+) -> List[Column]:
+    """Колонки таблицы model для полей schema в порядке их объявления.
+
+    Если переданы fields, выбираются только они и id.
+    """
+    return [
+        model.__table__.c[name]
+        for name in schema.__fields__
+        if name not in exclude and (
+            fields is None or name == 'id' or name in fields
+        )
+    ]
+
+
+def row_to_dict(row: Row, exclude_none: bool = False) -> dict:
+    if exclude_none:
+        return {
+            key: value
+            for key, value in row._mapping.items()
+            if value is not None
+        }
+    return dict(row._mapping)
+
+
+def _default(value):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    raise TypeError(f'Тип {type(value).__name__} не сериализуется в JSON.')
+
+
+def dumps(obj) -> bytes:
+    """JSON в байтах: через orjson, если он установлен, иначе через json."""
+    if orjson is not None:
+        return orjson.dumps(obj)
+    return json.dumps(
+        obj, default=_default, ensure_ascii=False, separators=(',', ':')
+    ).encode()
+
+
+def dumps_rows(rows: Iterable[Row], exclude_none: bool = False) -> bytes:
+    """JSON-массив строк в байтах."""
+    return dumps([row_to_dict(row, exclude_none) for row in rows])
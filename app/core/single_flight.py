@@ -0,0 +1,43 @@
+import asyncio
+from typing import Any, Awaitable, Callable, Dict, Hashable
+
+
+class SingleFlight:
+    """Объединяет одновременные одинаковые вычисления в одно.
+
+    Пока вычисление с ключом key выполняется, остальные вызовы с тем же
+    ключом ждут его результат. Вычисление идёт в отдельной задаче,
+    поэтому отмена одного из ожидающих не прерывает его для остальных.
+    """
+
+    def __init__(self):
+        self.calls = 0
+        self.coalesced = 0
+        self._in_flight: Dict[Hashable, asyncio.Future] = {}
+
+    async def run(
+        self,
+        key: Hashable,
+        operation: Callable[[], Awaitable[Any]],
+    ) -> Any:
+        self.calls += 1
+        flight = self._in_flight.get(key)
+        if flight is None:
+            flight = asyncio.ensure_future(operation())
+            self._in_flight[key] = flight
+            flight.add_done_callback(
+                lambda _: self._in_flight.pop(key, None)
+            )
+        else:
+            self.coalesced += 1
+        return await asyncio.shield(flight)
+
+    def stats(self) -> Dict[str, float]:
+        return {
+            'calls': self.calls,
+            'coalesced': self.coalesced,
+            'coalescing_ratio': (
+                self.coalesced / self.calls if self.calls else 0.0
+            ),
+            'in_flight': len(self._in_flight),
+        }
@@ -1,26 +1,80 @@
-from typing import Optional, Union
+import uuid
+from typing import Any, Dict, Optional, Union
+
+import jwt
 
 from fastapi import Depends, Request
+from fastapi.security import OAuth2PasswordRequestForm
 from fastapi_users import (
     BaseUserManager,
     FastAPIUsers,
     IntegerIDMixin,
     InvalidPasswordException,
+    exceptions,
 )
 from fastapi_users.authentication import (
     AuthenticationBackend,
     BearerTransport,
     JWTStrategy,
 )
+from fastapi_users.jwt import decode_jwt, generate_jwt
 from fastapi_users_db_sqlalchemy import SQLAlchemyUserDatabase
+from sqlalchemy import inspect
 from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import make_transient_to_detached
 
+from app.core.cache import TTLCache
 from app.core.config import settings
+from app.core.constants import JWT_USER_CLAIMS
+from app.core.password import ThreadPoolPasswordHelper
 from app.core.db import get_async_session
 from app.models.user import User
 from app.schemas.user import UserCreate
 
 
+user_cache = TTLCache(settings.user_cache_ttl, settings.user_cache_maxsize)
+password_helper = ThreadPoolPasswordHelper(settings.password_hash_workers)
+
+
+def _detached_copy(user: User) -> User:
+    """Копия пользователя, не связанная ни с одной сессией."""
+    copy = User(**{
+        attr.key: getattr(user, attr.key)
+        for attr in inspect(User).column_attrs
+    })
+    make_transient_to_detached(copy)
+    return copy
+
+
+class TokenRevocation:
+    """Поколения пользователей для отзыва JWT-токенов с правами.
+
+    Поколение меняется при изменении пользователя. boot_id отличает
+    процессы и перезапуски: токен, выданный другим процессом, не
+    совпадёт с поколением этого. Поколения хранятся в памяти процесса,
+    и изменение пользователя в другом процессе токены этого процесса
+    не отзывает, поэтому JWT_CLAIMS только для запуска в одном процессе.
+    """
+
+    def __init__(self):
+        self.boot_id = uuid.uuid4().hex
+        self._generations: Dict[int, int] = {}
+
+    def generation(self, user_id: int) -> str:
+        return f'{self.boot_id}.{self._generations.get(user_id, 0)}'
+
+    def revoke(self, user_id: int) -> None:
+        self._generations[user_id] = self._generations.get(user_id, 0) + 1
+
+
+token_revocation = TokenRevocation()
+
+
+def _forget_user(user: User) -> None:
+    user_cache.clear()
+    token_revocation.revoke(user.id)
+
+
 async def get_user_db(session: AsyncSession = Depends(get_async_session)):
     yield SQLAlchemyUserDatabase(session, User)
 
@@ -28,8 +82,56 @@ async def get_user_db(session: AsyncSession = Depends(get_async_session)):
 bearer_transport = BearerTransport(tokenUrl='auth/jwt/login')
 
 
+class ClaimsJWTStrategy(JWTStrategy):
+    """JWT с правами пользователя для авторизации без запроса к БД.
+
+    Пока поколение пользователя в токене совпадает с текущим, пользователь
+    собирается из токена. Иначе он загружается из БД, как в JWTStrategy.
+    """
+
+    async def write_token(self, user: User) -> str:
+        data = {
+            'user_id': str(user.id),
+            'aud': self.token_audience,
+            'gen': token_revocation.generation(user.id),
+            **{claim: getattr(user, claim) for claim in JWT_USER_CLAIMS},
+        }
+        return generate_jwt(
+            data, self.encode_key, self.lifetime_seconds, self.algorithm
+        )
+
+    async def read_token(
+        self,
+        token: Optional[str],
+        user_manager: BaseUserManager[User, int],
+    ) -> Optional[User]:
+        if token is None:
+            return None
+        try:
+            data = decode_jwt(
+                token,
+                self.decode_key,
+                self.token_audience,
+                algorithms=[self.algorithm],
+            )
+            user_id = user_manager.parse_id(data.get('user_id'))
+        except (jwt.PyJWTError, exceptions.InvalidID):
+            return None
+        if (
+            data.get('gen') != token_revocation.generation(user_id) or
+            not set(JWT_USER_CLAIMS) <= data.keys()
+        ):
+            return await super().read_token(token, user_manager)
+        user = User(
+            id=user_id, **{claim: data[claim] for claim in JWT_USER_CLAIMS}
+        )
+        make_transient_to_detached(user)
+        return await user_manager.user_db.session.merge(user, load=False)
+
+
 def get_jwt_strategy() -> JWTStrategy:
-    return JWTStrategy(secret=settings.secret, lifetime_seconds=3600)
+    strategy = ClaimsJWTStrategy if settings.jwt_claims else JWTStrategy
+    return strategy(secret=settings.secret, lifetime_seconds=3600)
 
 
 auth_backend = AuthenticationBackend(
@@ -41,6 +143,87 @@ auth_backend = AuthenticationBackend(
 
 class UserManager(IntegerIDMixin, BaseUserManager[User, int]):
 
+    def __init__(
+        self,
+        user_db: SQLAlchemyUserDatabase,
+        helper: Optional[ThreadPoolPasswordHelper] = None,
+    ):
+        super().__init__(user_db, helper or password_helper)
+
+    async def get(self, id: int) -> User:
+        """Пользователь по id, из кеша без запроса к БД, если кеш включён.
+
+        Копия из кеша присоединяется к сессии запроса, поэтому её можно
+        изменять и сохранять как загруженный объект.
+        """
+        cached = user_cache.get(id)
+        if cached is not None:
+            return await self.user_db.session.merge(cached, load=False)
+        generation = user_cache.generation
+        user = await super().get(id)
+        user_cache.set(id, _detached_copy(user), generation)
+        return user
+
+    async def create(
+        self,
+        user_create: UserCreate,
+        safe: bool = False,
+        request: Optional[Request] = None,
+    ) -> User:
+        """Как в BaseUserManager, но пароль хешируется в пуле потоков."""
+        await self.validate_password(user_create.password, user_create)
+        if await self.user_db.get_by_email(user_create.email) is not None:
+            raise exceptions.UserAlreadyExists()
+        user_dict = (
+            user_create.create_update_dict()
+            if safe
+            else user_create.create_update_dict_superuser()
+        )
+        user_dict['hashed_password'] = await self.password_helper.hash_async(
+            user_dict.pop('password')
+        )
+        created_user = await self.user_db.create(user_dict)
+        await self.on_after_register(created_user, request)
+        return created_user
+
+    async def authenticate(
+        self, credentials: OAuth2PasswordRequestForm
+    ) -> Optional[User]:
+        """Как в BaseUserManager, но пароль проверяется в пуле потоков."""
+        try:
+            user = await self.get_by_email(credentials.username)
+        except exceptions.UserNotExists:
+            # Хеширование уравнивает время ответа для неизвестного e-mail.
+            await self.password_helper.hash_async(credentials.password)
+            return None
+        verified, updated_password_hash = (
+            await self.password_helper.verify_and_update_async(
+                credentials.password, user.hashed_password
+            )
+        )
+        if not verified:
+            return None
+        if updated_password_hash is not None:
+            await self.user_db.update(
+                user, {'hashed_password': updated_password_hash}
+            )
+        return user
+
+    async def _update(self, user: User, update_dict: Dict[str, Any]) -> User:
+        """Как в BaseUserManager, но пароль хешируется в пуле потоков."""
+        if 'password' in update_dict:
+            update_dict = dict(update_dict)
+            password = update_dict.pop('password')
+            await self.validate_password(password, user)
+            update_dict['hashed_password'] = (
+                await self.password_helper.hash_async(password)
+            )
+        return await super()._update(user, update_dict)
+
+    async def delete(self, user: User) -> None:
+        await super().delete(user)
+        _forget_user(user)
+
     async def validate_password(
         self,
         password: str,
@@ -60,6 +243,24 @@ class UserManager(IntegerIDMixin, BaseUserManager[User, int]):
     ):
         print(f'Пользователь {user.email} зарегистрирован.')
 
+    async def on_after_update(
+        self,
+        user: User,
+        update_dict: Dict[str, Any],
+        request: Optional[Request] = None,
+    ):
+        _forget_user(user)
+
+    async def on_after_verify(
+        self, user: User, request: Optional[Request] = None
+    ):
+        _forget_user(user)
+
+    async def on_after_reset_password(
+        self, user: User, request: Optional[Request] = None
+    ):
+        _forget_user(user)
+
 
 async def get_user_manager(user_db=Depends(get_user_db)):
     yield UserManager(user_db)
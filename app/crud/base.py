@@ -1,12 +1,42 @@
-from typing import Optional
+import base64
+import binascii
+import json
+from datetime import datetime
+from typing import AsyncIterator, List, Optional, Sequence, Tuple
 
 from fastapi.encoders import jsonable_encoder
-from sqlalchemy import select
+from sqlalchemy import (
+    Column, DateTime, Integer, cast, func, insert, select, tuple_
+)
 from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.engine import Row
+from sqlalchemy.sql import ColumnElement
 
+from app.core.constants import PAGE_DEFAULT_LIMIT
+from app.core.db import save_changes
 from app.models import User
 
 
+class InvalidCursorError(ValueError):
+    pass
+
+
+def encode_cursor(position: dict) -> str:
+    return base64.urlsafe_b64encode(
+        json.dumps(position, separators=(',', ':')).encode()
+    ).decode()
+
+
+def decode_cursor(cursor: str) -> dict:
+    try:
+        position = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+    except (binascii.Error, UnicodeDecodeError, ValueError) as error:
+        raise InvalidCursorError(cursor) from error
+    if not isinstance(position, dict):
+        raise InvalidCursorError(cursor)
+    return position
+
+
 class CRUDBase:
 
     def __init__(self, model):
@@ -17,27 +47,180 @@ class CRUDBase:
         obj_id: int,
         session: AsyncSession,
     ):
-        db_obj = await session.execute(
-            select(self.model).where(self.model.id == obj_id)
+        return await session.get(self.model, obj_id)
+
+    async def get_many(
+        self,
+        obj_ids: Sequence[int],
+        session: AsyncSession,
+        columns: Optional[Sequence[Column]] = None,
+    ) -> List:
+        """Объекты с id из obj_ids одним запросом IN, по возрастанию id."""
+        query = select(*columns) if columns else select(self.model)
+        db_objs = await session.execute(
+            query.where(self.model.id.in_(obj_ids)).order_by(self.model.id)
+        )
+        return db_objs.all() if columns else db_objs.scalars().all()
+
+    async def get_version(
+        self,
+        session: AsyncSession,
+        where: Sequence[ColumnElement] = (),
+    ) -> Row:
+        """Наибольший id, число строк и суммы изменяемых колонок.
+
+        Колонки берутся без чтения строк целиком, одним проходом.
+        """
+        version = await session.execute(
+            select(
+                func.max(self.model.id),
+                func.count(),
+                func.sum(self.model.full_amount),
+                func.sum(self.model.invested_amount),
+                func.sum(cast(self.model.fully_invested, Integer)),
+            ).where(*where)
         )
-        return db_obj.scalars().first()
+        return version.one()
 
-    async def get_multi(self, session: AsyncSession):
-        db_objs = await session.execute(select(self.model))
-        return db_objs.scalars().all()
+    async def get_page(
+        self,
+        session: AsyncSession,
+        limit: int = PAGE_DEFAULT_LIMIT,
+        cursor: Optional[str] = None,
+        where: Sequence = (),
+        columns: Optional[Sequence[Column]] = None,
+        order_by: Optional[ColumnElement] = None,
+        descending: bool = False,
+    ) -> Tuple[List, Optional[str]]:
+        """Страница объектов и курсор следующей.
+
+        Объекты упорядочены по order_by (по умолчанию по id), при равных
+        значениях -- по id. Страница читается после позиции из курсора,
+        поэтому время запроса не зависит от номера страницы. Курсор
+        следующей страницы равен None на последней странице. С columns
+        вместо ORM-объектов возвращаются строки только с этими колонками.
+        """
+        sort_key = self.model.id if order_by is None else order_by
+        entities = list(columns) if columns else [self.model]
+        query = select(*entities, sort_key.label('sort_key'))
+        if where:
+            query = query.where(*where)
+        if cursor is not None:
+            query = query.where(
+                self._after_cursor(cursor, order_by, descending)
+            )
+        order = [self.model.id] if order_by is None else [
+            order_by, self.model.id
+        ]
+        if descending:
+            order = [column.desc() for column in order]
+        db_objs = await session.execute(
+            query.order_by(*order).limit(limit + 1)
+        )
+        db_objs = db_objs.freeze()
+        sort_keys = db_objs().scalars(len(entities)).all()
+        db_objs = db_objs().columns(*range(len(entities)))
+        db_objs = db_objs.all() if columns else db_objs.scalars().all()
+        if len(db_objs) <= limit:
+            return db_objs, None
+        position = {'id': db_objs[limit - 1].id}
+        if order_by is not None:
+            position['key'] = jsonable_encoder(sort_keys[limit - 1])
+        return db_objs[:limit], encode_cursor(position)
+
+    def _after_cursor(
+        self,
+        cursor: str,
+        order_by: Optional[ColumnElement],
+        descending: bool,
+    ) -> ColumnElement:
+        position = decode_cursor(cursor)
+        after_id = position.get('id')
+        if not isinstance(after_id, int):
+            raise InvalidCursorError(cursor)
+        if order_by is None:
+            return self.model.id > after_id
+        after_key = position.get('key')
+        try:
+            if isinstance(order_by.type, DateTime):
+                after_key = datetime.fromisoformat(after_key)
+        except (TypeError, ValueError) as error:
+            raise InvalidCursorError(cursor) from error
+        if not isinstance(after_key, (int, datetime)):
+            raise InvalidCursorError(cursor)
+        keys = tuple_(order_by, self.model.id)
+        if descending:
+            return keys < tuple_(after_key, after_id)
+        return keys > tuple_(after_key, after_id)
+
+    async def stream_rows(
+        self,
+        session: AsyncSession,
+        chunk_size: int,
+        columns: Optional[Sequence[Column]] = None,
+    ) -> AsyncIterator[List[Row]]:
+        """Все строки таблицы по возрастанию id порциями по chunk_size.
+
+        Строки читаются через серверный курсор без создания ORM-объектов,
+        поэтому в памяти держится только текущая порция.
+        """
+        query = select(*columns) if columns else select(self.model.__table__)
+        result = await session.stream(query.order_by(self.model.id))
+        async for rows in result.partitions(chunk_size):
+            yield rows
 
     async def create(
-        self, obj_in, session: AsyncSession, user: Optional[User] = None
+        self,
+        obj_in,
+        session: AsyncSession,
+        user: Optional[User] = None,
     ):
         obj_in_data = obj_in.dict()
         if user:
             obj_in_data['user_id'] = user.id
         db_obj = self.model(**obj_in_data)
         session.add(db_obj)
-        await session.commit()
-        await session.refresh(db_obj)
+        await save_changes(session, db_obj)
         return db_obj
 
+    async def create_multi(
+        self,
+        objs_in: list,
+        session: AsyncSession,
+        user: Optional[User] = None,
+    ) -> List:
+        """Создаёт объекты и возвращает их в порядке objs_in.
+
+        Все объекты пачки получают одну дату создания. В SQLite строки
+        вставляются одним executemany: после первой вставки транзакция
+        единственный писатель БД, поэтому id новых строк идут подряд и
+        заканчиваются наибольшим id. В остальных СУБД объекты
+        записываются одним flush, id пачкой возвращает RETURNING, где
+        драйвер это поддерживает.
+        """
+        create_date = datetime.now()
+        objs_in_data = []
+        for obj_in in objs_in:
+            obj_in_data = obj_in.dict()
+            obj_in_data['create_date'] = create_date
+            if user:
+                obj_in_data['user_id'] = user.id
+            objs_in_data.append(obj_in_data)
+        if session.bind.dialect.name == 'sqlite':
+            await session.execute(insert(self.model), objs_in_data)
+            last_id = await session.scalar(select(func.max(self.model.id)))
+            db_objs = await session.execute(
+                select(self.model)
+                .where(self.model.id > last_id - len(objs_in_data))
+                .order_by(self.model.id)
+            )
+            db_objs = db_objs.scalars().all()
+        else:
+            db_objs = [self.model(**data) for data in objs_in_data]
+            session.add_all(db_objs)
+        await save_changes(session, *db_objs)
+        return db_objs
+
     @staticmethod
     async def update(
         db_obj,
@@ -51,8 +234,7 @@ class CRUDBase:
             if field in update_data:
                 setattr(db_obj, field, update_data[field])
         session.add(db_obj)
-        await session.commit()
-        await session.refresh(db_obj)
+        await save_changes(session, db_obj)
         return db_obj
 
     @staticmethod
@@ -61,5 +243,5 @@ class CRUDBase:
         session: AsyncSession,
     ):
         await session.delete(db_obj)
-        await session.commit()
+        await save_changes(session)
         return db_obj
@@ -1,8 +1,15 @@
-from typing import Optional
+from datetime import datetime
+from typing import List, Optional, Sequence, Tuple
 
-from sqlalchemy import select
+from sqlalchemy import Column, select
 from sqlalchemy.ext.asyncio import AsyncSession
 
+from app.core.constants import (
+    PAGE_DEFAULT_LIMIT,
+    PROJECT_ORDERING_CREATE_DATE,
+    PROJECT_ORDERING_ID,
+    PROJECT_ORDERING_REMAINING,
+)
 from app.crud.base import CRUDBase
 from app.models.charity_project import CharityProject
 
@@ -21,5 +28,63 @@ class CRUDCharityProject(CRUDBase):
         )
         return db_room_id.scalars().first()
 
+    async def get_existing_names(
+        self,
+        project_names: List[str],
+        session: AsyncSession,
+    ) -> List[str]:
+        names = await session.execute(
+            select(CharityProject.name).where(
+                CharityProject.name.in_(project_names)
+            )
+        )
+        return names.scalars().all()
+
+    async def get_page_filtered(
+        self,
+        session: AsyncSession,
+        limit: int = PAGE_DEFAULT_LIMIT,
+        cursor: Optional[str] = None,
+        columns: Optional[Sequence[Column]] = None,
+        fully_invested: Optional[bool] = None,
+        min_remaining: Optional[int] = None,
+        max_remaining: Optional[int] = None,
+        created_after: Optional[datetime] = None,
+        created_before: Optional[datetime] = None,
+        ordering: str = PROJECT_ORDERING_ID,
+    ) -> Tuple[List, Optional[str]]:
+        """Страница проектов по фильтрам в порядке ordering.
+
+        Минус перед ordering задаёт убывающий порядок. Открытые проекты
+        по остатку читаются по индексу ix_charityproject_open_remaining,
+        фильтры по дате создания -- по ix_charityproject_create_date.
+        """
+        remaining = CharityProject.full_amount - CharityProject.invested_amount
+        where = []
+        if fully_invested is not None:
+            where.append(CharityProject.fully_invested.is_(fully_invested))
+        if min_remaining is not None:
+            where.append(remaining >= min_remaining)
+        if max_remaining is not None:
+            where.append(remaining <= max_remaining)
+        if created_after is not None:
+            where.append(CharityProject.create_date > created_after)
+        if created_before is not None:
+            where.append(CharityProject.create_date < created_before)
+        order_by = {
+            PROJECT_ORDERING_ID: None,
+            PROJECT_ORDERING_CREATE_DATE: CharityProject.create_date,
+            PROJECT_ORDERING_REMAINING: remaining,
+        }[ordering.lstrip('-')]
+        return await self.get_page(
+            session,
+            limit,
+            cursor,
+            where=where,
+            columns=columns,
+            order_by=order_by,
+            descending=ordering.startswith('-'),
+        )
+
 
 charity_project_crud = CRUDCharityProject(CharityProject)
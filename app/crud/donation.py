@@ -1,21 +1,40 @@
-from typing import List
+from typing import List, Optional, Sequence, Tuple
 
-from sqlalchemy import select
+from sqlalchemy import Column
+from sqlalchemy.engine import Row
 from sqlalchemy.ext.asyncio import AsyncSession
 
+from app.core.constants import PAGE_DEFAULT_LIMIT
 from app.crud.base import CRUDBase
 from app.models import Donation, User
 
 
 class CRUDDonation(CRUDBase):
 
-    async def get_donations_by_user(
-        self, user: User, session: AsyncSession
-    ) -> List[Donation]:
-        donations = await session.execute(
-            select(Donation).where(Donation.user_id == user.id)
+    async def get_page_by_user(
+        self,
+        user: User,
+        session: AsyncSession,
+        limit: int = PAGE_DEFAULT_LIMIT,
+        cursor: Optional[str] = None,
+        columns: Optional[Sequence[Column]] = None,
+    ) -> Tuple[List, Optional[str]]:
+        return await self.get_page(
+            session,
+            limit,
+            cursor,
+            where=[Donation.user_id == user.id],
+            columns=columns,
+        )
+
+    async def get_version_by_user(
+        self,
+        user: User,
+        session: AsyncSession,
+    ) -> Row:
+        return await self.get_version(
+            session, where=[Donation.user_id == user.id]
         )
-        return donations.scalars().all()
 
 
 donation_crud = CRUDDonation(Donation)
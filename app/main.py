@@ -1,8 +1,18 @@
 from fastapi import FastAPI
 
+from app.core.boot import boot_report
 from app.core.config import settings
+from app.core.constants import (
+    ALLOCATION_ENGINE_LEDGER,
+    ALLOCATION_MODE_BACKGROUND,
+)
+from app.core.db import AsyncSessionLocal
 from app.api.routers import main_router
 from app.core.init_db import create_first_superuser
+from app.core.user import password_helper
+from app.services.allocation_worker import allocation_worker
+from app.services.group_commit import group_commit_writer
+from app.services.ledger import funds_ledger
 
 app = FastAPI(
     title=settings.app_title,
@@ -11,8 +21,30 @@ app = FastAPI(
 )
 
 app.include_router(main_router)
+boot_report.mark('import')
 
 
 @app.on_event('startup')
 async def startup():
-    await create_first_superuser()
+    with boot_report.measure('startup'):
+        with boot_report.measure('first_superuser'):
+            await create_first_superuser()
+        if settings.allocation_engine == ALLOCATION_ENGINE_LEDGER:
+            with boot_report.measure('ledger'):
+                async with AsyncSessionLocal() as session:
+                    await funds_ledger.load(session)
+        if settings.group_commit:
+            group_commit_writer.start()
+        if settings.allocation_mode == ALLOCATION_MODE_BACKGROUND:
+            allocation_worker.start()
+    boot_report.finish()
+    if settings.boot_budget is not None:
+        print(boot_report)
+        boot_report.check_budget(settings.boot_budget)
+
+
+@app.on_event('shutdown')
+async def shutdown():
+    await allocation_worker.stop()
+    await group_commit_writer.stop()
+    password_helper.shutdown()
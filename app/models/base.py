@@ -1,6 +1,7 @@
 from datetime import datetime
 
-from sqlalchemy import Boolean, Column, DateTime, Integer
+from sqlalchemy import Boolean, Column, DateTime, Index, Integer, column
+from sqlalchemy.orm import declared_attr
 
 from app.core.db import Base
 
@@ -8,9 +9,39 @@ from app.core.db import Base
 class BaseModel(Base):
 
     __abstract__ = True
+    __mapper_args__ = {'eager_defaults': True}
 
     full_amount = Column(Integer, nullable=False)
     invested_amount = Column(Integer, default=0)
     fully_invested = Column(Boolean, default=False)
     create_date = Column(DateTime, default=datetime.now)
     close_date = Column(DateTime)
+    allocation_pending = Column(Boolean, default=False)
+
+    @declared_attr
+    def __table_args__(cls):
+        """Индексы очередей открытых и ожидающих распределения объектов.
+
+        На SQLite и PostgreSQL индексы частичные, на остальных СУБД
+        создаются обычные составные индексы.
+        """
+        open_funds = column('fully_invested').is_(False)
+        pending = column('allocation_pending').is_(True)
+        return (
+            Index(
+                f'ix_{cls.__tablename__}_open_funds',
+                'fully_invested',
+                'create_date',
+                'id',
+                sqlite_where=open_funds,
+                postgresql_where=open_funds,
+            ),
+            Index(
+                f'ix_{cls.__tablename__}_allocation_pending',
+                'allocation_pending',
+                'create_date',
+                'id',
+                sqlite_where=pending,
+                postgresql_where=pending,
+            ),
+        )
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, String, Text
+from sqlalchemy import Column, Index, String, Text, column
 
 from .base import BaseModel
 from app.core.constants import CHARITY_PROJECT_NAME_MAX_LEN
@@ -9,3 +9,18 @@ class CharityProject(BaseModel):
         String(CHARITY_PROJECT_NAME_MAX_LEN), unique=True, nullable=False
     )
     description = Column(Text, nullable=False)
+
+
+Index(
+    'ix_charityproject_create_date',
+    CharityProject.create_date,
+    CharityProject.id,
+)
+Index(
+    'ix_charityproject_open_remaining',
+    CharityProject.fully_invested,
+    CharityProject.full_amount - CharityProject.invested_amount,
+    CharityProject.id,
+    sqlite_where=column('fully_invested').is_(False),
+    postgresql_where=column('fully_invested').is_(False),
+)
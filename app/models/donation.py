@@ -4,5 +4,5 @@ from .base import BaseModel
 
 
 class Donation(BaseModel):
-    user_id = Column(Integer, ForeignKey('user.id'))
+    user_id = Column(Integer, ForeignKey('user.id'), index=True)
     comment = Column(Text, nullable=True)
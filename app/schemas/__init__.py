@@ -1,3 +1,4 @@
+from .allocation import AllocationStatus  # noqa
 from .charity_project import (  # noqa
     CharityProjectBase,  # noqa
     CharityProjectCreate,  # noqa
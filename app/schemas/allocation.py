@@ -0,0 +1,11 @@
+from pydantic import BaseModel
+
+
+class AllocationStatus(BaseModel):
+    id: int
+    invested_amount: int
+    fully_invested: bool
+    allocation_pending: bool
+
+    class Config:
+        orm_mode = True
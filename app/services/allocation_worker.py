@@ -0,0 +1,128 @@
+import asyncio
+from typing import List, Optional, Union
+
+from sqlalchemy import event, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.config import settings
+from app.core.db import AsyncSessionLocal, in_unit_of_work, save_changes
+from app.models import CharityProject, Donation
+from app.services.base import BaseService
+
+
+class AllocationWorker:
+    """Фоновое распределение средств для объектов, созданных без него.
+
+    Ожидающие объекты обоих типов обрабатываются в порядке FIFO по дате
+    создания, каждый в своей транзакции.
+    """
+
+    counterparts = {CharityProject: Donation, Donation: CharityProject}
+
+    def __init__(self):
+        self._task: Optional[asyncio.Task] = None
+        self._wakeup: Optional[asyncio.Event] = None
+
+    def start(self, session_factory=AsyncSessionLocal) -> None:
+        self._wakeup = asyncio.Event()
+        self._task = asyncio.create_task(self._run(session_factory))
+
+    async def stop(self) -> None:
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+
+    def notify(self) -> None:
+        if self._wakeup is not None:
+            self._wakeup.set()
+
+    async def defer(
+        self,
+        obj: Union[CharityProject, Donation],
+        session: AsyncSession,
+    ) -> Union[CharityProject, Donation]:
+        """Помечает объект ожидающим распределения и будит воркер."""
+        obj.allocation_pending = True
+        session.add(obj)
+        await save_changes(session, obj)
+        self._notify_after_commit(session)
+        return obj
+
+    async def defer_many(
+        self,
+        objs: List[Union[CharityProject, Donation]],
+        session: AsyncSession,
+    ) -> List[Union[CharityProject, Donation]]:
+        for obj in objs:
+            obj.allocation_pending = True
+        session.add_all(objs)
+        await save_changes(session, *objs)
+        self._notify_after_commit(session)
+        return objs
+
+    def _notify_after_commit(self, session: AsyncSession) -> None:
+        """Будит воркер, когда ожидающие объекты станут ему видны."""
+        if not in_unit_of_work(session):
+            self.notify()
+            return
+        event.listen(
+            session.sync_session,
+            'after_commit',
+            lambda _: self.notify(),
+            once=True,
+        )
+
+    async def _run(self, session_factory) -> None:
+        while True:
+            self._wakeup.clear()
+            try:
+                async with session_factory() as session:
+                    await self.process_pending(session)
+            except Exception as error:
+                print(f'Ошибка фонового распределения средств: {error}')
+            try:
+                await asyncio.wait_for(
+                    self._wakeup.wait(), settings.allocation_poll_interval
+                )
+            except asyncio.TimeoutError:
+                pass
+
+    @staticmethod
+    async def _get_next_pending(
+        session: AsyncSession,
+    ) -> Optional[Union[CharityProject, Donation]]:
+        candidates = []
+        for model in (CharityProject, Donation):
+            candidate = await session.execute(
+                select(model)
+                .where(model.allocation_pending.is_(True))
+                .order_by(model.create_date, model.id)
+                .limit(1)
+            )
+            candidate = candidate.scalars().first()
+            if candidate is not None:
+                candidates.append(candidate)
+        if not candidates:
+            return None
+        return min(candidates, key=lambda obj: obj.create_date)
+
+    async def process_pending(self, session: AsyncSession) -> int:
+        """Распределяет средства всех ожидающих объектов по очереди."""
+        processed = 0
+        while True:
+            obj = await self._get_next_pending(session)
+            if obj is None:
+                return processed
+            obj.allocation_pending = False
+            await BaseService._investments_process(
+                obj, self.counterparts[type(obj)], session
+            )
+            processed += 1
+
+
+allocation_worker = AllocationWorker()
@@ -1,13 +1,26 @@
+from collections import deque
 from datetime import datetime
-from typing import List, Union, Tuple, Type
+from typing import Awaitable, Callable, List, Optional, Union, Tuple, Type
 
 from fastapi import HTTPException, status
-from sqlalchemy import select
+from pydantic import BaseModel
+from sqlalchemy import Column, Text, and_, func, or_, select, update
+from sqlalchemy.engine import Row
 from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import defer
 
-from app.core.constants import INVESTED_AMOUNT_TO_PROHIBIT_DELETION
+from app.core.config import settings
+from app.core.constants import (
+    ALLOCATION_ENGINE_LEDGER,
+    ALLOCATION_ENGINE_SQL,
+    INVESTED_AMOUNT_TO_PROHIBIT_DELETION,
+)
+from app.core.db import in_unit_of_work, save_changes, unit_of_work
 from app.crud import charity_project_crud
+from app.crud.base import CRUDBase, InvalidCursorError
 from app.models import CharityProject, Donation
+from app.services.cache import object_cache, read_flights, write_generation
+from app.services.ledger import LedgerOutOfSyncError, funds_ledger
 
 
 class BaseService:
@@ -25,6 +38,110 @@ class BaseService:
                 detail='Проект с таким именем уже существует!',
             )
 
+    @staticmethod
+    async def _check_names_duplicate(
+        project_names: List[str],
+        session: AsyncSession,
+    ) -> None:
+        if len(set(project_names)) != len(project_names):
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail='Имена проектов в запросе повторяются!',
+            )
+        existing_names = await charity_project_crud.get_existing_names(
+            project_names, session
+        )
+        if existing_names:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail='Проекты с такими именами уже существуют: '
+                f'{", ".join(existing_names)}',
+            )
+
+    @staticmethod
+    async def _get_cached(
+        model: Type[Union[CharityProject, Donation]],
+        schema: Type[BaseModel],
+        obj_id: int,
+        session: AsyncSession,
+    ) -> Optional[BaseModel]:
+        """Объект по id из кеша объектов или из сессии через session.get."""
+        key = (model, obj_id)
+        obj = object_cache.get(key)
+        if obj is not None:
+            return obj
+        generation = object_cache.generation
+        obj = await session.get(model, obj_id)
+        if obj is None:
+            return None
+        obj = schema.from_orm(obj)
+        object_cache.set(key, obj, generation)
+        return obj
+
+    @staticmethod
+    async def _get_many(
+        crud: CRUDBase,
+        obj_ids: List[int],
+        session: AsyncSession,
+        columns: Optional[List[Column]] = None,
+    ) -> Tuple[List, List[int]]:
+        """Объекты в порядке obj_ids и id, которых нет в БД."""
+        found = {
+            obj.id: obj
+            for obj in await crud.get_many(obj_ids, session, columns)
+        }
+        return (
+            [found[obj_id] for obj_id in obj_ids if obj_id in found],
+            [obj_id for obj_id in obj_ids if obj_id not in found],
+        )
+
+    @staticmethod
+    async def _coalesce(
+        key: Tuple,
+        session: AsyncSession,
+        operation: Callable[[AsyncSession], Awaitable],
+    ):
+        """Одно чтение на все одновременные запросы с одинаковым key.
+
+        В ключ входит номер записи, поэтому запрос, пришедший после
+        записи, не получит результат чтения, начатого до неё. operation
+        читает в своей сессии на той же БД, что и session: сессия первого
+        запроса закроется вместе с ним, а результат ждут и остальные.
+        """
+        bind = session.bind
+
+        async def read():
+            async with AsyncSession(bind=bind) as session:
+                return await operation(session)
+
+        return await read_flights.run((write_generation.value, *key), read)
+
+    @staticmethod
+    def _fields_key(fields: Optional[List[str]]) -> Optional[frozenset]:
+        return None if fields is None else frozenset(fields)
+
+    @staticmethod
+    async def _get_version(version: Awaitable[Row]) -> str:
+        """Версия списка: номер записи через приложение и агрегаты таблицы.
+
+        Номер записи меняется при любой записи этого процесса, агрегаты --
+        при добавлении строк и распределении средств другими процессами.
+        Правки имени и описания другими процессами версию не меняют.
+        """
+        return '.'.join(map(str, (write_generation, *await version)))
+
+    @staticmethod
+    async def _get_page(
+        page: Awaitable[Tuple[List, Optional[str]]],
+    ) -> Tuple[List, Optional[str]]:
+        try:
+            return await page
+        except InvalidCursorError:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail='Некорректный курсор страницы!',
+            )
+
     @staticmethod
     def _check_project_closed(charity_project: CharityProject) -> None:
         if charity_project.fully_invested:
@@ -61,12 +178,34 @@ class BaseService:
     async def _get_uninvested_objects(
         obj_in: Type[Union[CharityProject, Donation]],
         session: AsyncSession,
+        after: Optional[Union[CharityProject, Donation]] = None,
     ) -> List[Union[CharityProject, Donation]]:
-        objects = await session.execute(
+        """Очередная порция открытых объектов в порядке FIFO.
+
+        Текстовые колонки для распределения не нужны и не читаются.
+        """
+        query = (
             select(obj_in)
+            .options(*(
+                defer(column.key)
+                for column in obj_in.__table__.columns
+                if isinstance(column.type, Text)
+            ))
             .where(obj_in.fully_invested.is_(False))
-            .order_by(obj_in.create_date)
+            .order_by(obj_in.create_date, obj_in.id)
+            .limit(settings.allocation_chunk_size)
         )
+        if after is not None:
+            query = query.where(
+                or_(
+                    obj_in.create_date > after.create_date,
+                    and_(
+                        obj_in.create_date == after.create_date,
+                        obj_in.id > after.id,
+                    ),
+                )
+            )
+        objects = await session.execute(query)
         return objects.scalars().all()
 
     @staticmethod
@@ -98,6 +237,173 @@ class BaseService:
             cls._close_object_for_donation(obj_in)
         return obj_in, model
 
+    @classmethod
+    async def _allocate_by_objects(
+        cls,
+        objs_in: List[Union[CharityProject, Donation]],
+        model: Type[Union[CharityProject, Donation]],
+        session: AsyncSession,
+    ) -> None:
+        """Распределение за один проход очереди model по порядку objs_in."""
+        objects_model = deque()
+        last_object = None
+        exhausted = False
+        for obj_in in objs_in:
+            while not obj_in.fully_invested:
+                if not objects_model:
+                    if exhausted:
+                        return
+                    objects_model.extend(
+                        await cls._get_uninvested_objects(
+                            model, session, last_object
+                        )
+                    )
+                    exhausted = (
+                        len(objects_model) < settings.allocation_chunk_size
+                    )
+                    if not objects_model:
+                        return
+                    last_object = objects_model[-1]
+                model_object = objects_model[0]
+                cls._allocate_investment_funds(obj_in, model_object)
+                session.add(model_object)
+                if model_object.fully_invested:
+                    objects_model.popleft()
+
+    @classmethod
+    async def _allocate_by_cumulative_sums(
+        cls,
+        obj_in: Union[CharityProject, Donation],
+        model: Type[Union[CharityProject, Donation]],
+        session: AsyncSession,
+    ) -> None:
+        """Распределение средств в БД через накопленные суммы остатков.
+
+        Объекты очереди, накопленная сумма остатков которых не превышает
+        свободную сумму obj_in, закрываются одним UPDATE, единственный
+        частично заполненный объект обновляется вторым.
+        """
+        need_amount = obj_in.full_amount - obj_in.invested_amount
+        free_amount = model.full_amount - model.invested_amount
+        queue = (
+            select(
+                model.id,
+                free_amount.label('free_amount'),
+                func.sum(free_amount)
+                .over(order_by=(model.create_date, model.id), rows=(None, 0))
+                .label('cumulative_amount'),
+            )
+            .where(model.fully_invested.is_(False))
+            .subquery()
+        )
+        last_touched = (
+            await session.execute(
+                select(queue)
+                .where(
+                    queue.c.cumulative_amount - queue.c.free_amount <
+                    need_amount
+                )
+                .order_by(queue.c.cumulative_amount.desc())
+                .limit(1)
+            )
+        ).first()
+        if last_touched is None:
+            return
+        await session.execute(
+            update(model)
+            .where(
+                model.id.in_(
+                    select(queue.c.id).where(
+                        queue.c.cumulative_amount <= need_amount
+                    )
+                )
+            )
+            .values(
+                invested_amount=model.full_amount,
+                fully_invested=True,
+                close_date=datetime.now(),
+            )
+            .execution_options(synchronize_session=False)
+        )
+        if last_touched.cumulative_amount > need_amount:
+            await session.execute(
+                update(model)
+                .where(model.id == last_touched.id)
+                .values(
+                    invested_amount=model.invested_amount + need_amount -
+                    last_touched.cumulative_amount +
+                    last_touched.free_amount
+                )
+                .execution_options(synchronize_session=False)
+            )
+        if last_touched.cumulative_amount >= need_amount:
+            cls._close_object_for_donation(obj_in)
+        else:
+            obj_in.invested_amount += last_touched.cumulative_amount
+
+    @classmethod
+    async def _allocate_by_ledger(
+        cls,
+        obj_in: Union[CharityProject, Donation],
+        model: Type[Union[CharityProject, Donation]],
+        session: AsyncSession,
+    ) -> Union[CharityProject, Donation]:
+        """Распределение средств по резидентным очередям в памяти.
+
+        Если записанные строки не совпали с состоянием БД, распределение
+        откатывается и выполняется пообъектно, а очереди перечитываются
+        при следующем распределении. Внутри unit_of_work откатить только
+        распределение нельзя, поэтому выбрасывается LedgerOutOfSyncError,
+        а очереди сбрасываются, если транзакция не закоммитится.
+        """
+        session.add(obj_in)
+        async with funds_ledger.lock:
+            if not funds_ledger.loaded:
+                await funds_ledger.load(session)
+            plan = funds_ledger.plan(obj_in, model)
+            if not await funds_ledger.write(plan, session):
+                funds_ledger.invalidate()
+                if in_unit_of_work(session):
+                    raise LedgerOutOfSyncError
+                await session.rollback()
+                await session.refresh(obj_in)
+                await cls._allocate_by_objects([obj_in], model, session)
+                await save_changes(session, obj_in)
+                return obj_in
+            obj_in.invested_amount += plan.allocated
+            if obj_in.invested_amount == obj_in.full_amount:
+                cls._close_object_for_donation(obj_in)
+            await save_changes(session, obj_in)
+            if in_unit_of_work(session):
+                funds_ledger.apply_uncommitted(plan, obj_in, session)
+            else:
+                funds_ledger.apply(plan, obj_in)
+        return obj_in
+
+    @classmethod
+    async def _investments_process_many(
+        cls,
+        objs_in: List[Union[CharityProject, Donation]],
+        model: Type[Union[CharityProject, Donation]],
+        session: AsyncSession,
+    ) -> List[Union[CharityProject, Donation]]:
+        """Распределение средств для пачки новых объектов в порядке создания.
+
+        Пообъектный движок проходит очередь model один раз для всей пачки,
+        остальные движки распределяют объекты по одному в общей транзакции.
+        """
+        async with unit_of_work(session):
+            session.add_all(objs_in)
+            if settings.allocation_engine in (
+                ALLOCATION_ENGINE_SQL, ALLOCATION_ENGINE_LEDGER
+            ):
+                for obj_in in objs_in:
+                    await cls._investments_process(obj_in, model, session)
+            else:
+                await cls._allocate_by_objects(objs_in, model, session)
+            await save_changes(session, *objs_in)
+        return objs_in
+
     @classmethod
     async def _investments_process(
         cls,
@@ -105,11 +411,40 @@ class BaseService:
         model: Type[Union[CharityProject, Donation]],
         session: AsyncSession,
     ) -> Union[CharityProject, Donation]:
-        objects_model = await cls._get_uninvested_objects(model, session)
-        for model in objects_model:
-            obj_in, model = cls._allocate_investment_funds(obj_in, model)
-            session.add(obj_in)
-            session.add(model)
-        await session.commit()
-        await session.refresh(obj_in)
+        if settings.allocation_engine == ALLOCATION_ENGINE_LEDGER:
+            return await cls._allocate_by_ledger(obj_in, model, session)
+        session.add(obj_in)
+        if settings.allocation_engine == ALLOCATION_ENGINE_SQL:
+            await cls._allocate_by_cumulative_sums(obj_in, model, session)
+        else:
+            await cls._allocate_by_objects([obj_in], model, session)
+        await save_changes(session, obj_in)
         return obj_in
+
+    @staticmethod
+    async def _in_unit_of_work(
+        session: AsyncSession,
+        operation: Callable[[], Awaitable],
+    ):
+        """Выполняет operation в одной транзакции с одним коммитом.
+
+        Если очереди в памяти разошлись с БД, транзакция откатывается
+        и operation выполняется заново по перечитанным очередям. Внутри
+        внешнего unit_of_work operation выполняется как есть.
+        """
+        if in_unit_of_work(session):
+            return await operation()
+        try:
+            async with unit_of_work(session):
+                return await operation()
+        except LedgerOutOfSyncError:
+            pass
+        except BaseException:
+            funds_ledger.invalidate()
+            raise
+        try:
+            async with unit_of_work(session):
+                return await operation()
+        except BaseException:
+            funds_ledger.invalidate()
+            raise
@@ -0,0 +1,25 @@
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+from app.core.cache import TTLCache, WriteGeneration
+from app.core.config import settings
+from app.core.single_flight import SingleFlight
+
+object_cache = TTLCache(settings.object_cache_ttl)
+listing_cache = TTLCache(
+    settings.listing_cache_ttl, settings.listing_cache_maxsize
+)
+write_generation = WriteGeneration()
+read_flights = SingleFlight()
+
+
+@event.listens_for(Session, 'after_commit')
+def clear_caches(session: Session) -> None:
+    """Сбрасывает кеши после любого коммита.
+
+    Распределение средств меняет объекты, которые заранее неизвестны,
+    поэтому кеш очищается целиком.
+    """
+    object_cache.clear()
+    listing_cache.clear()
+    write_generation.bump()
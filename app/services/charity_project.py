@@ -1,13 +1,23 @@
-from typing import Type
+from functools import partial
+from typing import List, Optional, Tuple, Type
 
 from fastapi import Depends
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from app.core.db import get_async_session
+from app.core.config import settings
+from app.core.constants import ALLOCATION_MODE_BACKGROUND, PAGE_DEFAULT_LIMIT
+from app.core.db import get_async_session, in_unit_of_work
+from app.core.serialization import dumps_rows, schema_columns
 from app.crud import charity_project_crud
 from app.models import CharityProject
-from app.schemas import CharityProjectCreate, CharityProjectUpdate
+from app.schemas import (
+    CharityProjectCreate, CharityProjectDB, CharityProjectUpdate
+)
+from app.services.allocation_worker import allocation_worker
 from app.services.base import BaseService
+from app.services.cache import listing_cache
+from app.services.group_commit import group_commit_writer
+from app.services.ledger import funds_ledger
 
 
 class CharityProjectService(BaseService):
@@ -18,16 +28,194 @@ class CharityProjectService(BaseService):
         model: Type[CharityProject],
         session: AsyncSession = Depends(get_async_session),
     ):
+        """Создаёт проект и распределяет средства одной транзакцией."""
+        if group_commit_writer.running and not in_unit_of_work(session):
+            return await group_commit_writer.submit(
+                session, partial(cls.create_charity_project, obj_in, model)
+            )
         await cls._check_name_duplicate(obj_in.name, session)
+        return await cls._in_unit_of_work(
+            session,
+            partial(cls._create_charity_project, obj_in, model, session),
+        )
+
+    @classmethod
+    async def _create_charity_project(
+        cls,
+        obj_in: CharityProjectCreate,
+        model: Type[CharityProject],
+        session: AsyncSession,
+    ):
         new_object = await charity_project_crud.create(obj_in, session)
-        await cls._investments_process(new_object, model, session)
-        return new_object
+        if settings.allocation_mode == ALLOCATION_MODE_BACKGROUND:
+            return await allocation_worker.defer(new_object, session)
+        return await cls._investments_process(new_object, model, session)
+
+    @classmethod
+    async def _create_charity_projects(
+        cls,
+        objs_in: List[CharityProjectCreate],
+        model: Type[CharityProject],
+        session: AsyncSession,
+    ):
+        new_objects = await charity_project_crud.create_multi(
+            objs_in, session
+        )
+        if settings.allocation_mode == ALLOCATION_MODE_BACKGROUND:
+            return await allocation_worker.defer_many(new_objects, session)
+        return await cls._investments_process_many(
+            new_objects, model, session
+        )
+
+    @classmethod
+    async def create_charity_projects(
+        cls,
+        objs_in: List[CharityProjectCreate],
+        model: Type[CharityProject],
+        session: AsyncSession = Depends(get_async_session),
+    ):
+        """Создаёт пачку проектов с одним распределением средств."""
+        await cls._check_names_duplicate(
+            [obj_in.name for obj_in in objs_in], session
+        )
+        return await cls._in_unit_of_work(
+            session,
+            partial(cls._create_charity_projects, objs_in, model, session),
+        )
 
-    @staticmethod
+    @classmethod
     async def get_all_charity_projects(
+        cls,
+        session: AsyncSession = Depends(get_async_session),
+        limit: int = PAGE_DEFAULT_LIMIT,
+        cursor: Optional[str] = None,
+        fields: Optional[List[str]] = None,
+        **filters,
+    ):
+        """Страница проектов строками с колонками CharityProjectDB.
+
+        filters -- фильтры и порядок CRUDCharityProject.get_page_filtered.
+        """
+        return await cls._get_page(
+            charity_project_crud.get_page_filtered(
+                session,
+                limit,
+                cursor,
+                columns=schema_columns(
+                    CharityProject, CharityProjectDB, fields=fields
+                ),
+                **filters,
+            )
+        )
+
+    @classmethod
+    async def get_charity_projects_version(
+        cls,
+        session: AsyncSession = Depends(get_async_session),
+    ) -> str:
+        return await cls._get_version(
+            charity_project_crud.get_version(session)
+        )
+
+    @classmethod
+    def get_cached_charity_projects_listing(
+        cls,
+        limit: int = PAGE_DEFAULT_LIMIT,
+        cursor: Optional[str] = None,
+        fields: Optional[List[str]] = None,
+        **filters,
+    ) -> Optional[Tuple[bytes, Optional[str], str]]:
+        """Страница из кеша списка без обращения к БД или None."""
+        return listing_cache.get(
+            cls._listing_key(limit, cursor, fields, filters)
+        )
+
+    @classmethod
+    async def get_charity_projects_listing(
+        cls,
+        session: AsyncSession = Depends(get_async_session),
+        limit: int = PAGE_DEFAULT_LIMIT,
+        cursor: Optional[str] = None,
+        fields: Optional[List[str]] = None,
+        **filters,
+    ) -> Tuple[bytes, Optional[str], str]:
+        """Страница проектов в JSON, курсор следующей страницы и версия.
+
+        Версия читается до страницы, поэтому ETag из неё не новее ответа.
+        Готовый ответ кешируется вместе с версией по набору параметров
+        запроса до следующей записи в БД, кеш проверяет
+        get_cached_charity_projects_listing. Одновременные одинаковые
+        запросы читают БД один раз.
+        """
+        key = cls._listing_key(limit, cursor, fields, filters)
+        return await cls._coalesce(
+            ('projects', *key),
+            session,
+            partial(
+                cls._get_charity_projects_listing,
+                key, limit, cursor, fields, filters,
+            ),
+        )
+
+    @classmethod
+    def _listing_key(
+        cls,
+        limit: int,
+        cursor: Optional[str],
+        fields: Optional[List[str]],
+        filters: dict,
+    ) -> Tuple:
+        return (
+            limit,
+            cursor,
+            cls._fields_key(fields),
+            tuple(sorted(filters.items())),
+        )
+
+    @classmethod
+    async def _get_charity_projects_listing(
+        cls,
+        key: Tuple,
+        limit: int,
+        cursor: Optional[str],
+        fields: Optional[List[str]],
+        filters: dict,
+        session: AsyncSession,
+    ) -> Tuple[bytes, Optional[str], str]:
+        generation = listing_cache.generation
+        version = await cls.get_charity_projects_version(session)
+        projects, next_cursor = await cls.get_all_charity_projects(
+            session, limit, cursor, fields, **filters
+        )
+        listing = (
+            dumps_rows(projects, exclude_none=True), next_cursor, version
+        )
+        listing_cache.set(key, listing, generation)
+        return listing
+
+    @classmethod
+    async def get_charity_projects_by_ids(
+        cls,
+        project_ids: List[int],
+        session: AsyncSession = Depends(get_async_session),
+        fields: Optional[List[str]] = None,
+    ):
+        return await cls._get_many(
+            charity_project_crud,
+            project_ids,
+            session,
+            schema_columns(CharityProject, CharityProjectDB, fields=fields),
+        )
+
+    @classmethod
+    async def get_charity_project(
+        cls,
+        project_id: int,
         session: AsyncSession = Depends(get_async_session),
     ):
-        return await charity_project_crud.get_multi(session)
+        return await cls._get_cached(
+            CharityProject, CharityProjectDB, project_id, session
+        )
 
     @classmethod
     async def partially_update_charity_project(
@@ -41,7 +229,9 @@ class CharityProjectService(BaseService):
             await cls._check_name_duplicate(obj_in.name, session)
         if obj_in.full_amount:
             cls._check_project_invested_sum(obj, obj_in.full_amount)
-        return await charity_project_crud.update(obj, obj_in, session)
+        obj = await charity_project_crud.update(obj, obj_in, session)
+        funds_ledger.invalidate()
+        return obj
 
     @classmethod
     async def delete_charity_project(
@@ -50,4 +240,6 @@ class CharityProjectService(BaseService):
         session: AsyncSession = Depends(get_async_session),
     ):
         cls._check_project_already_invested(obj)
-        return await charity_project_crud.remove(db_obj=obj, session=session)
+        obj = await charity_project_crud.remove(db_obj=obj, session=session)
+        funds_ledger.invalidate()
+        return obj
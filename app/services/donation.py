@@ -1,14 +1,26 @@
-from typing import Type, Optional
+from functools import partial
+from typing import AsyncIterator, List, Type, Optional
 
 from fastapi import Depends
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from app.core.db import get_async_session
+from app.core.config import settings
+from app.core.constants import (
+    ALLOCATION_MODE_BACKGROUND,
+    EXPORT_CHUNK_SIZE,
+    EXPORT_FORMAT_JSON,
+    EXPORT_FORMAT_NDJSON,
+    PAGE_DEFAULT_LIMIT,
+)
+from app.core.db import get_async_session, in_unit_of_work
+from app.core.serialization import dumps, row_to_dict, schema_columns
 from app.core.user import current_user
 from app.crud import donation_crud
 from app.models import Donation, User
-from app.schemas import DonationBase
+from app.schemas import DonationBase, DonationCreate, DonationDB
+from app.services.allocation_worker import allocation_worker
 from app.services.base import BaseService
+from app.services.group_commit import group_commit_writer
 
 
 class DonationService(BaseService):
@@ -19,20 +31,186 @@ class DonationService(BaseService):
         model: Type[Donation],
         session: AsyncSession = Depends(get_async_session),
         user: Optional[User] = None,
+    ):
+        """Создаёт пожертвование и распределяет средства одной транзакцией."""
+        if group_commit_writer.running and not in_unit_of_work(session):
+            return await group_commit_writer.submit(
+                session, partial(cls.create_donation, obj_in, model, user=user)
+            )
+        return await cls._in_unit_of_work(
+            session,
+            partial(cls._create_donation, obj_in, model, session, user),
+        )
+
+    @classmethod
+    async def _create_donation(
+        cls,
+        obj_in: DonationBase,
+        model: Type[Donation],
+        session: AsyncSession,
+        user: Optional[User] = None,
     ):
         new_object = await donation_crud.create(obj_in, session, user)
-        await cls._investments_process(new_object, model, session)
-        return new_object
+        if settings.allocation_mode == ALLOCATION_MODE_BACKGROUND:
+            return await allocation_worker.defer(new_object, session)
+        return await cls._investments_process(new_object, model, session)
 
-    @staticmethod
+    @classmethod
+    async def _create_donations(
+        cls,
+        objs_in: List[DonationBase],
+        model: Type[Donation],
+        session: AsyncSession,
+        user: Optional[User] = None,
+    ):
+        new_objects = await donation_crud.create_multi(objs_in, session, user)
+        if settings.allocation_mode == ALLOCATION_MODE_BACKGROUND:
+            return await allocation_worker.defer_many(new_objects, session)
+        return await cls._investments_process_many(
+            new_objects, model, session
+        )
+
+    @classmethod
+    async def create_donations(
+        cls,
+        objs_in: List[DonationBase],
+        model: Type[Donation],
+        session: AsyncSession = Depends(get_async_session),
+        user: Optional[User] = None,
+    ):
+        """Создаёт пачку пожертвований с одним распределением средств."""
+        return await cls._in_unit_of_work(
+            session,
+            partial(cls._create_donations, objs_in, model, session, user),
+        )
+
+    @classmethod
     async def get_all_donations(
+        cls,
         session: AsyncSession = Depends(get_async_session),
+        limit: int = PAGE_DEFAULT_LIMIT,
+        cursor: Optional[str] = None,
+        fields: Optional[List[str]] = None,
+        version: Optional[str] = None,
     ):
-        return await donation_crud.get_multi(session)
+        """Страница пожертвований строками с колонками DonationDB.
+
+        Запросы с разной версией списка version не объединяются, чтобы
+        ответ не получил ETag новее прочитанных данных.
+        """
+        return await cls._coalesce(
+            ('donations', version, limit, cursor, cls._fields_key(fields)),
+            session,
+            lambda session: cls._get_page(
+                donation_crud.get_page(
+                    session,
+                    limit,
+                    cursor,
+                    columns=schema_columns(
+                        Donation, DonationDB, fields=fields
+                    ),
+                )
+            ),
+        )
+
+    @classmethod
+    async def get_donations_by_ids(
+        cls,
+        donation_ids: List[int],
+        session: AsyncSession = Depends(get_async_session),
+        fields: Optional[List[str]] = None,
+    ):
+        return await cls._get_many(
+            donation_crud,
+            donation_ids,
+            session,
+            schema_columns(Donation, DonationDB, fields=fields),
+        )
+
+    @classmethod
+    async def get_donation(
+        cls,
+        donation_id: int,
+        session: AsyncSession = Depends(get_async_session),
+    ):
+        return await cls._get_cached(
+            Donation, DonationDB, donation_id, session
+        )
 
     @staticmethod
+    async def export_donations(
+        session: AsyncSession,
+        export_format: str = EXPORT_FORMAT_NDJSON,
+    ) -> AsyncIterator[bytes]:
+        """Все пожертвования порциями в виде NDJSON или JSON-массива."""
+        separator = b''
+        if export_format == EXPORT_FORMAT_JSON:
+            yield b'['
+        async for rows in donation_crud.stream_rows(
+            session, EXPORT_CHUNK_SIZE, schema_columns(Donation, DonationDB)
+        ):
+            items = [
+                dumps(row_to_dict(row, exclude_none=True)) for row in rows
+            ]
+            if export_format == EXPORT_FORMAT_JSON:
+                yield separator + b','.join(items)
+                separator = b','
+            else:
+                yield b''.join(item + b'\n' for item in items)
+        if export_format == EXPORT_FORMAT_JSON:
+            yield b']'
+
+    @classmethod
+    async def get_donations_version(
+        cls,
+        session: AsyncSession = Depends(get_async_session),
+    ) -> str:
+        return await cls._get_version(donation_crud.get_version(session))
+
+    @classmethod
+    async def get_user_donations_version(
+        cls,
+        user: User = Depends(current_user),
+        session: AsyncSession = Depends(get_async_session),
+    ) -> str:
+        version = await cls._get_version(
+            donation_crud.get_version_by_user(user, session)
+        )
+        return f'{user.id}.{version}'
+
+    @classmethod
     async def get_user_donations(
+        cls,
         user: User = Depends(current_user),
         session: AsyncSession = Depends(get_async_session),
+        limit: int = PAGE_DEFAULT_LIMIT,
+        cursor: Optional[str] = None,
+        fields: Optional[List[str]] = None,
+        version: Optional[str] = None,
     ):
-        return await donation_crud.get_donations_by_user(user, session)
+        """Страница пожертвований пользователя с колонками DonationCreate.
+
+        Запросы с разной версией списка version не объединяются.
+        """
+        return await cls._coalesce(
+            (
+                'user_donations',
+                user.id,
+                version,
+                limit,
+                cursor,
+                cls._fields_key(fields),
+            ),
+            session,
+            lambda session: cls._get_page(
+                donation_crud.get_page_by_user(
+                    user,
+                    session,
+                    limit,
+                    cursor,
+                    columns=schema_columns(
+                        Donation, DonationCreate, fields=fields
+                    ),
+                )
+            ),
+        )
@@ -0,0 +1,138 @@
+import asyncio
+from typing import Any, Awaitable, Callable, List, Optional, Tuple
+
+from fastapi import HTTPException
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.config import settings
+from app.core.db import unit_of_work
+from app.services.ledger import LedgerOutOfSyncError, funds_ledger
+
+Operation = Callable[[AsyncSession], Awaitable[Any]]
+QueuedOperation = Tuple[Operation, asyncio.Future]
+
+
+class GroupCommitWriter:
+    """Единственный писатель, применяющий создания объектов пачками.
+
+    Операции, накопившиеся в очереди, выполняются по порядку внутри
+    одного unit_of_work с одним коммитом. HTTPException операция должна
+    выбрасывать до первой записи. Если пачка
+    упала с другой ошибкой, она откатывается и операции повторяются
+    по одной в отдельных транзакциях.
+    """
+
+    def __init__(self):
+        self._queue: Optional[asyncio.Queue] = None
+        self._task: Optional[asyncio.Task] = None
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    def start(self) -> None:
+        self._queue = asyncio.Queue()
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+        while not self._queue.empty():
+            _, _, future = self._queue.get_nowait()
+            if not future.done():
+                future.set_exception(RuntimeError('Писатель остановлен.'))
+
+    async def submit(self, session: AsyncSession, operation: Operation):
+        """Ставит операцию в очередь и ждёт результат её пачки."""
+        future = asyncio.get_running_loop().create_future()
+        await self._queue.put((session.bind, operation, future))
+        return await future
+
+    async def _run(self) -> None:
+        while True:
+            bind, operation, future = await self._queue.get()
+            batches = {bind: [(operation, future)]}
+            size = 1
+            while size < settings.group_commit_max_batch_size:
+                try:
+                    bind, operation, future = self._queue.get_nowait()
+                except asyncio.QueueEmpty:
+                    break
+                batches.setdefault(bind, []).append((operation, future))
+                size += 1
+            for bind, batch in batches.items():
+                try:
+                    await self._apply_batch(bind, batch)
+                except Exception as error:
+                    for _, future in batch:
+                        if not future.done():
+                            future.set_exception(error)
+
+    @staticmethod
+    async def _run_operations(
+        session: AsyncSession, batch: List[QueuedOperation]
+    ) -> list:
+        results = []
+        for operation, future in batch:
+            if future.done():
+                continue
+            try:
+                results.append((future, await operation(session)))
+            except HTTPException as error:
+                future.set_exception(error)
+        return results
+
+    async def _apply_batch(self, bind, batch: List[QueuedOperation]) -> None:
+        async with AsyncSession(bind=bind) as session:
+            try:
+                async with unit_of_work(session):
+                    results = await self._run_operations(session, batch)
+            except Exception:
+                funds_ledger.invalidate()
+            else:
+                for future, result in results:
+                    if not future.done():
+                        future.set_result(result)
+                return
+        for operation, future in batch:
+            if not future.done():
+                await self._apply_one(bind, operation, future)
+
+    @classmethod
+    async def _apply_one(cls, bind, operation: Operation, future) -> None:
+        """Выполняет операцию отдельной транзакцией.
+
+        Если очереди в памяти разошлись с БД, операция выполняется
+        заново по перечитанным очередям, как в
+        BaseService._in_unit_of_work.
+        """
+        try:
+            try:
+                result = await cls._apply_alone(bind, operation)
+            except LedgerOutOfSyncError:
+                result = await cls._apply_alone(bind, operation)
+        except Exception as error:
+            if not future.done():
+                future.set_exception(error)
+        else:
+            if not future.done():
+                future.set_result(result)
+
+    @staticmethod
+    async def _apply_alone(bind, operation: Operation):
+        async with AsyncSession(bind=bind) as session:
+            try:
+                async with unit_of_work(session):
+                    return await operation(session)
+            except Exception:
+                funds_ledger.invalidate()
+                raise
+
+
+group_commit_writer = GroupCommitWriter()
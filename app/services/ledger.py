@@ -0,0 +1,223 @@
+import asyncio
+from collections import deque
+from datetime import datetime
+from typing import Deque, Dict, List, Optional, Type, Union
+
+from sqlalchemy import event, select, tuple_, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session, SessionTransaction
+
+from app.models import CharityProject, Donation
+
+UNCOMMITTED_PLANS_KEY = 'ledger_uncommitted_plans'
+
+
+class LedgerOutOfSyncError(Exception):
+    """Очереди в памяти разошлись с состоянием БД."""
+
+
+class LedgerEntry:
+    """Открытый объект очереди: id, свободная сумма и дата создания."""
+
+    __slots__ = ('id', 'remaining', 'create_date')
+
+    def __init__(self, obj_id: int, remaining: int, create_date: datetime):
+        self.id = obj_id
+        self.remaining = remaining
+        self.create_date = create_date
+
+
+class LedgerPlan:
+    """Решение о распределении, принятое по очередям в памяти."""
+
+    __slots__ = ('model', 'closed', 'partial', 'partial_amount', 'allocated')
+
+    def __init__(self, model: Type[Union[CharityProject, Donation]]):
+        self.model = model
+        self.closed: List[LedgerEntry] = []
+        self.partial: Optional[LedgerEntry] = None
+        self.partial_amount = 0
+        self.allocated = 0
+
+
+class FundsLedger:
+    """Резидентные FIFO-очереди открытых проектов и пожертвований.
+
+    Работает корректно только при одном процессе приложения: изменения,
+    сделанные в обход очередей, обнаруживаются при записи в БД, после чего
+    очереди перечитываются.
+    """
+
+    models = (CharityProject, Donation)
+
+    def __init__(self):
+        self.queues: Dict[type, Deque[LedgerEntry]] = {}
+        self.loaded = False
+        self._lock: Optional[asyncio.Lock] = None
+
+    @property
+    def lock(self) -> asyncio.Lock:
+        if self._lock is None:
+            self._lock = asyncio.Lock()
+        return self._lock
+
+    def invalidate(self) -> None:
+        self.loaded = False
+
+    async def load(self, session: AsyncSession) -> None:
+        for model in self.models:
+            rows = await session.execute(
+                select(
+                    model.id,
+                    model.full_amount - model.invested_amount,
+                    model.create_date,
+                )
+                .where(model.fully_invested.is_(False))
+                .order_by(model.create_date, model.id)
+            )
+            self.queues[model] = deque(LedgerEntry(*row) for row in rows)
+        self.loaded = True
+
+    def plan(
+        self,
+        obj_in: Union[CharityProject, Donation],
+        model: Type[Union[CharityProject, Donation]],
+    ) -> LedgerPlan:
+        plan = LedgerPlan(model)
+        need_amount = obj_in.full_amount - obj_in.invested_amount
+        for entry in self.queues[model]:
+            if plan.allocated == need_amount:
+                break
+            free_amount = need_amount - plan.allocated
+            if entry.remaining <= free_amount:
+                plan.closed.append(entry)
+                plan.allocated += entry.remaining
+            else:
+                plan.partial = entry
+                plan.partial_amount = free_amount
+                plan.allocated += free_amount
+        return plan
+
+    @staticmethod
+    async def write(plan: LedgerPlan, session: AsyncSession) -> bool:
+        """Записывает изменённые строки и сверяет их с состоянием БД.
+
+        Каждая строка меняется, только если её свободная сумма в БД
+        совпадает с очередью.
+        """
+        model = plan.model
+        if plan.closed:
+            result = await session.execute(
+                update(model)
+                .where(
+                    tuple_(
+                        model.id, model.full_amount - model.invested_amount
+                    ).in_(
+                        [(entry.id, entry.remaining) for entry in plan.closed]
+                    ),
+                    model.fully_invested.is_(False),
+                )
+                .values(
+                    invested_amount=model.full_amount,
+                    fully_invested=True,
+                    close_date=datetime.now(),
+                )
+                .execution_options(synchronize_session=False)
+            )
+            if result.rowcount != len(plan.closed):
+                return False
+        if plan.partial is not None:
+            result = await session.execute(
+                update(model)
+                .where(
+                    model.id == plan.partial.id,
+                    model.full_amount - model.invested_amount ==
+                    plan.partial.remaining,
+                )
+                .values(
+                    invested_amount=model.invested_amount +
+                    plan.partial_amount
+                )
+                .execution_options(synchronize_session=False)
+            )
+            if result.rowcount != 1:
+                return False
+        return True
+
+    def apply_uncommitted(
+        self,
+        plan: LedgerPlan,
+        obj_in: Union[CharityProject, Donation],
+        session: AsyncSession,
+    ) -> None:
+        """Переносит в очереди распределение незакоммиченной транзакции.
+
+        Следующие распределения той же транзакции видят его в очередях.
+        Если транзакция завершится без коммита, очереди перечитываются.
+        """
+        session.info[UNCOMMITTED_PLANS_KEY] = True
+        self.apply(plan, obj_in)
+
+    def apply(
+        self, plan: LedgerPlan, obj_in: Union[CharityProject, Donation]
+    ) -> None:
+        """Переносит закоммиченное распределение в очереди.
+
+        obj_in мог попасть в свою очередь при загрузке, если его строка
+        была записана до неё: тогда обновляется уже загруженная запись.
+        """
+        queue = self.queues[plan.model]
+        for _ in plan.closed:
+            queue.popleft()
+        if plan.partial is not None:
+            plan.partial.remaining -= plan.partial_amount
+        own_queue = self.queues[type(obj_in)]
+        loaded = self._find_loaded(own_queue, obj_in)
+        if loaded is not None:
+            if obj_in.fully_invested:
+                own_queue.remove(loaded)
+            else:
+                loaded.remaining = obj_in.full_amount - obj_in.invested_amount
+            return
+        if obj_in.fully_invested:
+            return
+        if own_queue and own_queue[-1].create_date > obj_in.create_date:
+            self.invalidate()
+            return
+        own_queue.append(
+            LedgerEntry(
+                obj_in.id,
+                obj_in.full_amount - obj_in.invested_amount,
+                obj_in.create_date,
+            )
+        )
+
+    @staticmethod
+    def _find_loaded(
+        queue: Deque[LedgerEntry], obj_in: Union[CharityProject, Donation]
+    ) -> Optional[LedgerEntry]:
+        for entry in reversed(queue):
+            if entry.id == obj_in.id:
+                return entry
+            if entry.create_date < obj_in.create_date:
+                return None
+        return None
+
+
+funds_ledger = FundsLedger()
+
+
+@event.listens_for(Session, 'after_commit')
+def confirm_uncommitted_plans(session: Session) -> None:
+    session.info.pop(UNCOMMITTED_PLANS_KEY, None)
+
+
+@event.listens_for(Session, 'after_transaction_end')
+def discard_uncommitted_plans(
+    session: Session, transaction: SessionTransaction
+) -> None:
+    """Сбрасывает очереди, если транзакция с распределением откатилась."""
+    if transaction.parent is None and session.info.pop(
+        UNCOMMITTED_PLANS_KEY, None
+    ):
+        funds_ledger.invalidate()
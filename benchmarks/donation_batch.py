@@ -0,0 +1,44 @@
+"""Пропускная способность POST /donation/batch против POST /donation/.
+
+Запуск из корня проекта:
+    python -m benchmarks.donation_batch --donations 2000 --batch-size 200
+"""
+import argparse
+import tempfile
+import time
+from pathlib import Path
+
+from fastapi.testclient import TestClient
+
+from benchmarks.utils import prepare_app
+
+
+def run(donations: int, batch_size: int, projects: int) -> None:
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        db_path = Path(tmp_dir) / 'bench.db'
+        app = prepare_app(db_path, projects)
+        with TestClient(app) as client:
+            started = time.perf_counter()
+            for _ in range(donations):
+                client.post('/donation/', json={'full_amount': 10})
+            single = time.perf_counter() - started
+
+            started = time.perf_counter()
+            for _ in range(donations // batch_size):
+                client.post(
+                    '/donation/batch',
+                    json=[{'full_amount': 10}] * batch_size,
+                )
+            batch = time.perf_counter() - started
+    print(f'POST /donation/:      {donations / single:10.1f} пожертвований/с')
+    print(f'POST /donation/batch: {donations / batch:10.1f} пожертвований/с')
+    print(f'Ускорение: x{single / batch:.1f}')
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--donations', type=int, default=2000)
+    parser.add_argument('--batch-size', type=int, default=200)
+    parser.add_argument('--projects', type=int, default=100)
+    args = parser.parse_args()
+    run(args.donations, args.batch_size, args.projects)
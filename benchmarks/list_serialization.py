@@ -0,0 +1,79 @@
+"""Сериализация списка проектов: ORM + pydantic против строк + orjson.
+
+Каждый путь выполняется repeat раз, берётся лучшее время, чтобы первый
+замер не платил за холодный кеш БД.
+
+Запуск из корня проекта:
+    python -m benchmarks.list_serialization --projects 100000
+"""
+import argparse
+import asyncio
+import tempfile
+import time
+from pathlib import Path
+
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+from sqlalchemy import select
+
+from app.api.endpoints.utils import rows_response
+from app.core import serialization
+from app.core.serialization import schema_columns
+from app.models import CharityProject
+from app.schemas import CharityProjectDB
+from benchmarks.utils import prepare_db
+
+
+async def orm_path(session) -> bytes:
+    """Прежний путь: ORM-объекты, orm_mode и response_model_exclude_none."""
+    projects = await session.execute(select(CharityProject))
+    return JSONResponse(jsonable_encoder(
+        [
+            CharityProjectDB.from_orm(project)
+            for project in projects.scalars().all()
+        ],
+        exclude_none=True,
+    )).body
+
+
+async def rows_path(session) -> bytes:
+    projects = await session.execute(
+        select(*schema_columns(CharityProject, CharityProjectDB))
+    )
+    return rows_response(projects.all(), exclude_none=True).body
+
+
+async def measure(session_factory, path, repeat: int) -> float:
+    timings = []
+    for _ in range(repeat):
+        async with session_factory() as session:
+            started = time.perf_counter()
+            await path(session)
+            timings.append(time.perf_counter() - started)
+    return min(timings)
+
+
+async def run(projects: int, repeat: int) -> None:
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        session_factory = prepare_db(Path(tmp_dir) / 'bench.db', projects)
+        orm = await measure(session_factory, orm_path, repeat)
+        rows = await measure(session_factory, rows_path, repeat)
+        orjson = serialization.orjson
+        serialization.orjson = None
+        try:
+            rows_json = await measure(session_factory, rows_path, repeat)
+        finally:
+            serialization.orjson = orjson
+    print(f'ORM + pydantic:     {orm:8.3f} с')
+    print(f'Строки + json:      {rows_json:8.3f} с')
+    if orjson is not None:
+        print(f'Строки + orjson:    {rows:8.3f} с')
+    print(f'Ускорение: x{orm / rows:.1f}')
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--projects', type=int, default=100000)
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+    asyncio.run(run(args.projects, args.repeat))
@@ -0,0 +1,102 @@
+"""Задержка цикла событий при волне входов: bcrypt в цикле против пула.
+
+Запуск из корня проекта:
+    python -m benchmarks.login_lag --logins 20
+"""
+import argparse
+import asyncio
+import statistics
+import tempfile
+import time
+from pathlib import Path
+from types import SimpleNamespace
+
+from fastapi_users import BaseUserManager
+from fastapi_users.password import PasswordHelper
+from fastapi_users_db_sqlalchemy import SQLAlchemyUserDatabase
+
+from app.core.config import settings
+from app.core.password import ThreadPoolPasswordHelper
+from app.core.user import UserManager
+from app.models import User
+from app.schemas.user import UserCreate
+from benchmarks.utils import prepare_db
+
+TICK = 0.005
+EMAIL = 'bench@example.com'
+PASSWORD = 'benchmark'
+
+
+async def sync_login(session_factory, credentials) -> None:
+    """Прежний путь: BaseUserManager проверяет пароль прямо в цикле."""
+    async with session_factory() as session:
+        manager = UserManager(
+            SQLAlchemyUserDatabase(session, User), PasswordHelper()
+        )
+        assert await BaseUserManager.authenticate(manager, credentials)
+
+
+async def pool_login(session_factory, credentials, helper) -> None:
+    async with session_factory() as session:
+        manager = UserManager(SQLAlchemyUserDatabase(session, User), helper)
+        assert await manager.authenticate(credentials)
+
+
+async def measure_lag(storm):
+    """Задержки тиков цикла событий, пока идёт storm, и время storm."""
+    lags = []
+    running = True
+
+    async def ticker():
+        while running:
+            started = time.perf_counter()
+            await asyncio.sleep(TICK)
+            lags.append(time.perf_counter() - started - TICK)
+
+    ticker_task = asyncio.create_task(ticker())
+    started = time.perf_counter()
+    await storm()
+    elapsed = time.perf_counter() - started
+    running = False
+    await ticker_task
+    return max(lags), statistics.median(lags), elapsed
+
+
+def report(title, lags) -> None:
+    lag_max, lag_median, elapsed = lags
+    print(
+        f'{title} задержка цикла: макс. {lag_max * 1000:8.1f} мс, '
+        f'медиана {lag_median * 1000:6.1f} мс; '
+        f'все входы за {elapsed:6.2f} с'
+    )
+
+
+async def run(logins: int, workers: int) -> None:
+    credentials = SimpleNamespace(username=EMAIL, password=PASSWORD)
+    helper = ThreadPoolPasswordHelper(workers)
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        session_factory = prepare_db(Path(tmp_dir) / 'bench.db')
+        async with session_factory() as session:
+            await UserManager(
+                SQLAlchemyUserDatabase(session, User), helper
+            ).create(UserCreate(email=EMAIL, password=PASSWORD))
+        before = await measure_lag(lambda: asyncio.gather(*(
+            sync_login(session_factory, credentials) for _ in range(logins)
+        )))
+        after = await measure_lag(lambda: asyncio.gather(*(
+            pool_login(session_factory, credentials, helper)
+            for _ in range(logins)
+        )))
+    helper.shutdown()
+    report('bcrypt в цикле:', before)
+    report(f'Пул из {workers}:   ', after)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--logins', type=int, default=20)
+    parser.add_argument(
+        '--workers', type=int, default=settings.password_hash_workers
+    )
+    args = parser.parse_args()
+    asyncio.run(run(args.logins, args.workers))
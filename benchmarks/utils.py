@@ -0,0 +1,46 @@
+from pathlib import Path
+
+from sqlalchemy import create_engine, insert
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+from sqlalchemy.orm import sessionmaker
+
+from app.core.db import Base, get_async_session
+from app.core.user import current_superuser, current_user
+from app.main import app
+from app.models import CharityProject, User
+
+BENCH_USER = User(id=1, is_active=True, is_verified=True, is_superuser=True)
+
+
+def prepare_db(db_path: Path, projects: int = 0) -> sessionmaker:
+    """Отдельная SQLite БД с projects проектами и фабрика сессий к ней."""
+    sync_engine = create_engine(f'sqlite:///{db_path}')
+    Base.metadata.create_all(sync_engine)
+    if projects:
+        with sync_engine.begin() as conn:
+            conn.execute(insert(CharityProject), [
+                {
+                    'name': f'project_{number}',
+                    'description': 'Benchmark project',
+                    'full_amount': 1000000,
+                }
+                for number in range(projects)
+            ])
+    sync_engine.dispose()
+
+    engine = create_async_engine(f'sqlite+aiosqlite:///{db_path}')
+    return sessionmaker(engine, class_=AsyncSession)
+
+
+def prepare_app(db_path: Path, projects: int = 0):
+    """Приложение на отдельной SQLite БД с пользователем-суперюзером."""
+    session_factory = prepare_db(db_path, projects)
+
+    async def override_db():
+        async with session_factory() as session:
+            yield session
+
+    app.dependency_overrides[get_async_session] = override_db
+    app.dependency_overrides[current_user] = lambda: BENCH_USER
+    app.dependency_overrides[current_superuser] = lambda: BENCH_USER
+    return app
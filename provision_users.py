@@ -0,0 +1,60 @@
+"""Массовое создание пользователей из CSV или JSONL.
+
+В CSV первая строка -- заголовок с полями `email`, `password` и, при
+необходимости, `is_active`, `is_superuser`, `is_verified`. В JSONL
+каждая строка -- объект с теми же полями. Пользователи с уже
+существующими e-mail пропускаются.
+
+Запуск из корня проекта:
+    python provision_users.py users.csv --processes 8
+"""
+import argparse
+import asyncio
+import csv
+import json
+import sys
+from pathlib import Path
+from typing import Iterator
+
+from app.core.constants import PROVISION_BATCH_SIZE
+from app.core.init_db import create_users
+
+
+def read_users(path: Path) -> Iterator[dict]:
+    with open(path, encoding='utf-8', newline='') as file:
+        if path.suffix.lower() == '.csv':
+            for row in csv.DictReader(file):
+                yield {key: value for key, value in row.items() if value}
+            return
+        for line in file:
+            if line.strip():
+                yield json.loads(line)
+
+
+async def provision(path: Path, processes: int, batch_size: int) -> None:
+    try:
+        created, skipped = await create_users(
+            read_users(path), processes, batch_size
+        )
+    except ValueError as error:
+        sys.exit(str(error))
+    print(f'Создано пользователей: {created}, пропущено: {skipped}.')
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(
+        description=__doc__,
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+    )
+    parser.add_argument('path', type=Path, help='Файл .csv или .jsonl')
+    parser.add_argument(
+        '--processes',
+        type=int,
+        default=None,
+        help='Процессов для хеширования паролей, по умолчанию по числу ядер',
+    )
+    parser.add_argument(
+        '--batch-size', type=int, default=PROVISION_BATCH_SIZE
+    )
+    args = parser.parse_args()
+    asyncio.run(provision(args.path, args.processes, args.batch_size))
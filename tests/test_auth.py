@@ -1,4 +1,22 @@
+import threading
+import time
+from types import SimpleNamespace
+
+import pytest
+from conftest import TestingSessionLocal, engine
+from fastapi_users_db_sqlalchemy import SQLAlchemyUserDatabase
+from sqlalchemy import event, update
+
+from app.core.config import settings
+from app.core import init_db
+from app.core.boot import BootReport
+from app.core.init_db import create_users
+from app.core.user import UserManager, password_helper, user_cache
+from app.models.user import User
+from app.schemas.user import UserUpdate
+
 REGISTER_URL = '/auth/register'
+LOGIN_URL = '/auth/jwt/login'
 
 
 def test_register(test_client):
@@ -49,3 +67,208 @@ def test_register_invalid_pass(user_client):
         'Убедитесь, что в ответе на некорректный POST-запрос '
         f'к эндпоинту `{REGISTER_URL}` есть ключ `detail`.'
     )
+
+
+async def test_user_manager_caches_users(monkeypatch):
+    monkeypatch.setattr(user_cache, 'ttl', 60)
+    async with TestingSessionLocal() as session:
+        user = User(email='cached@pool.com', hashed_password='hash')
+        session.add(user)
+        await session.flush()
+        user_id = user.id
+        await session.commit()
+        await UserManager(SQLAlchemyUserDatabase(session, User)).get(user_id)
+    queries = []
+
+    def count_query(conn, cursor, statement, *args):
+        queries.append(statement)
+
+    event.listen(engine.sync_engine, 'before_cursor_execute', count_query)
+    try:
+        async with TestingSessionLocal() as session:
+            manager = UserManager(SQLAlchemyUserDatabase(session, User))
+            user = await manager.get(user_id)
+            assert not queries, (
+                'Пользователь из кеша должен загружаться без запросов к БД.'
+            )
+            assert user in session, (
+                'Пользователь из кеша должен принадлежать сессии запроса.'
+            )
+            await manager.update(UserUpdate(is_active=False), user)
+    finally:
+        event.remove(
+            engine.sync_engine, 'before_cursor_execute', count_query
+        )
+    async with TestingSessionLocal() as session:
+        user = await UserManager(
+            SQLAlchemyUserDatabase(session, User)
+        ).get(user_id)
+    assert not user.is_active, (
+        'После изменения пользователя кеш должен сбрасываться.'
+    )
+
+
+def test_password_hashing_off_event_loop(test_client, monkeypatch):
+    monkeypatch.setattr(settings, 'secret', 'secret')
+    threads = []
+
+    def record_thread(func):
+        def wrapper(*args):
+            threads.append(threading.current_thread().name)
+            return func(*args)
+        return wrapper
+
+    monkeypatch.setattr(
+        password_helper, 'hash', record_thread(password_helper.hash)
+    )
+    monkeypatch.setattr(
+        password_helper,
+        'verify_and_update',
+        record_thread(password_helper.verify_and_update),
+    )
+    user_data = {'email': 'thread@pool.com', 'password': 'chimichangas'}
+    assert test_client.post(REGISTER_URL, json=user_data).status_code == 201
+    response = test_client.post(LOGIN_URL, data={
+        'username': user_data['email'], 'password': user_data['password'],
+    })
+    assert response.status_code == 200
+    assert 'access_token' in response.json()
+    response = test_client.post(LOGIN_URL, data={
+        'username': user_data['email'], 'password': 'wrong',
+    })
+    assert response.status_code == 400
+    assert len(threads) == 3 and all(
+        name.startswith('password') for name in threads
+    ), 'Пароли должны хешироваться и проверяться в пуле потоков.'
+
+
+async def test_claims_token_authorizes_without_user_query(
+    test_client, monkeypatch
+):
+    monkeypatch.setattr(settings, 'secret', 'secret')
+    monkeypatch.setattr(settings, 'jwt_claims', True)
+    user_data = {'email': 'claims@pool.com', 'password': 'chimichangas'}
+    user_id = test_client.post(REGISTER_URL, json=user_data).json()['id']
+    async with TestingSessionLocal() as session:
+        await session.execute(
+            update(User).where(User.id == user_id).values(is_superuser=True)
+        )
+        await session.commit()
+    token = test_client.post(LOGIN_URL, data={
+        'username': user_data['email'], 'password': user_data['password'],
+    }).json()['access_token']
+    headers = {'Authorization': f'Bearer {token}'}
+    queries = []
+
+    def count_query(conn, cursor, statement, *args):
+        queries.append(statement)
+
+    event.listen(engine.sync_engine, 'before_cursor_execute', count_query)
+    try:
+        response = test_client.get('/donation/', headers=headers)
+    finally:
+        event.remove(
+            engine.sync_engine, 'before_cursor_execute', count_query
+        )
+    assert response.status_code == 200
+    assert not any('FROM user' in query for query in queries), (
+        'Права из JWT-токена должны проверяться без запроса пользователя.'
+    )
+    async with TestingSessionLocal() as session:
+        manager = UserManager(SQLAlchemyUserDatabase(session, User))
+        await manager.update(
+            UserUpdate(is_superuser=False),
+            await manager.get(user_id),
+            safe=False,
+        )
+    assert test_client.get(
+        '/donation/', headers=headers
+    ).status_code == 403, (
+        'После изменения пользователя права из ранее выданного токена '
+        'должны перепроверяться по БД.'
+    )
+
+
+async def test_create_users_in_bulk():
+    async with TestingSessionLocal() as session:
+        session.add(User(email='existing@pool.com', hashed_password='hash'))
+        await session.commit()
+    created, skipped = await create_users(
+        [
+            {'email': 'first@pool.com', 'password': 'chimichangas'},
+            {'email': 'EXISTING@pool.com', 'password': 'chimichangas'},
+            {
+                'email': 'second@pool.com',
+                'password': 'chimichangas',
+                'is_superuser': 'true',
+            },
+            {'email': 'First@pool.com', 'password': 'chimichangas'},
+        ],
+        processes=1,
+        session_factory=TestingSessionLocal,
+    )
+    assert (created, skipped) == (2, 2), (
+        'Существующие и повторяющиеся e-mail должны пропускаться.'
+    )
+    async with TestingSessionLocal() as session:
+        manager = UserManager(SQLAlchemyUserDatabase(session, User))
+        user = await manager.get_by_email('second@pool.com')
+        assert user.is_superuser and user.is_active
+        assert await manager.authenticate(SimpleNamespace(
+            username='first@pool.com', password='chimichangas'
+        )), 'Созданный пользователь должен входить со своим паролем.'
+
+
+async def test_create_users_invalid_password():
+    with pytest.raises(ValueError, match='№2'):
+        await create_users(
+            [
+                {'email': 'first@pool.com', 'password': 'chimichangas'},
+                {'email': 'second@pool.com', 'password': '$'},
+            ],
+            processes=1,
+            session_factory=TestingSessionLocal,
+        )
+
+
+async def test_first_superuser_skipped_when_exists(monkeypatch):
+    created = []
+
+    async def create_user(email, password, is_superuser=False):
+        created.append(email)
+
+    monkeypatch.setattr(init_db, 'AsyncSessionLocal', TestingSessionLocal)
+    monkeypatch.setattr(init_db, 'create_user', create_user)
+    monkeypatch.setattr(settings, 'first_superuser_email', 'Root@pool.com')
+    monkeypatch.setattr(settings, 'first_superuser_password', 'root')
+    await init_db.create_first_superuser()
+    assert created == ['Root@pool.com']
+    async with TestingSessionLocal() as session:
+        session.add(User(email='Root@pool.com', hashed_password='hash'))
+        await session.commit()
+    await init_db.create_first_superuser()
+    assert created == ['Root@pool.com'], (
+        'Существующий суперпользователь не должен создаваться повторно.'
+    )
+
+
+def test_boot_report_budget():
+    report = BootReport()
+    with report.measure('hook'):
+        pass
+    report.mark('import')
+    assert set(report.stats()) == {'total', 'hook', 'import'}
+    report.check_budget(None)
+    report.check_budget(60)
+    with pytest.raises(RuntimeError, match='import'):
+        report.check_budget(0)
+
+
+def test_boot_report_total_frozen_after_finish():
+    report = BootReport()
+    report.finish()
+    total = report.total
+    time.sleep(0.01)
+    assert report.stats()['total'] == total, (
+        'После запуска общее время не должно расти вместе с uptime.'
+    )
@@ -2,6 +2,11 @@ import time
 from datetime import datetime
 
 import pytest
+from conftest import TEST_DB, engine
+from sqlalchemy import create_engine, event, update
+
+from app.models import CharityProject
+from app.services.cache import listing_cache, object_cache
 
 PROJECTS_URL = '/charity_project/'
 PROJECT_DETAILS_URL = PROJECTS_URL + '{project_id}'
@@ -728,3 +733,349 @@ def test_get_all_charity_project_not_auth_user(test_client):
         f'пользователя к эндпоинту `{PROJECTS_URL}` возвращается список '
         'существующих проектов.'
     )
+
+
+@pytest.mark.usefixtures('donation', 'another_donation')
+def test_create_charity_projects_batch(superuser_client):
+    response = superuser_client.post(PROJECTS_URL + 'batch', json=[
+        {'name': 'first', 'description': 'First', 'full_amount': 50},
+        {'name': 'second', 'description': 'Second', 'full_amount': 2000},
+        {'name': 'third', 'description': 'Third', 'full_amount': 100},
+    ])
+    assert response.status_code == 200, (
+        f'Корректный POST-запрос к эндпоинту `{PROJECTS_URL}batch` должен '
+        'возвращать ответ со статус-кодом 200.'
+    )
+    data = response.json()
+    assert [project['name'] for project in data] == [
+        'first', 'second', 'third'
+    ], 'Проекты пачки должны возвращаться в порядке запроса.'
+    assert [project['invested_amount'] for project in data] == [
+        50, 2000, 50
+    ], (
+        'Открытые пожертвования должны распределяться по проектам пачки '
+        'в порядке их создания.'
+    )
+    assert [project['fully_invested'] for project in data] == [
+        True, True, False
+    ]
+
+
+@pytest.mark.parametrize('json_data', [
+    [
+        {'name': 'twin', 'description': 'Twin', 'full_amount': 10},
+        {'name': 'twin', 'description': 'Twin', 'full_amount': 20},
+    ],
+    [
+        {'name': 'new', 'description': 'New', 'full_amount': 10},
+        {'name': 'chimichangas4life', 'description': 'Old', 'full_amount': 5},
+    ],
+], ids=['batch_duplicate', 'existing_name'])
+@pytest.mark.usefixtures('charity_project')
+def test_create_charity_projects_batch_duplicate_names(
+    superuser_client, json_data
+):
+    response = superuser_client.post(PROJECTS_URL + 'batch', json=json_data)
+    assert response.status_code == 400, (
+        'Пачка проектов с повторяющимися или уже занятыми именами '
+        'не должна создаваться.'
+    )
+    assert len(superuser_client.get(PROJECTS_URL).json()) == 1
+
+
+def test_create_charity_projects_batch_usual_user(user_client):
+    response = user_client.post(PROJECTS_URL + 'batch', json=[
+        {'name': 'first', 'description': 'First', 'full_amount': 50},
+    ])
+    assert response.status_code == 403, (
+        f'POST-запрос пользователя к эндпоинту `{PROJECTS_URL}batch` '
+        'должен вернуть ответ со статус-кодом 403.'
+    )
+
+
+def test_get_charity_projects_by_pages(superuser_client):
+    superuser_client.post(PROJECTS_URL + 'batch', json=[
+        {'name': f'page_{number}', 'description': 'Page', 'full_amount': 10}
+        for number in range(5)
+    ])
+    names = []
+    cursor = None
+    for _ in range(3):
+        params = {'limit': 2}
+        if cursor:
+            params['cursor'] = cursor
+        response = superuser_client.get(PROJECTS_URL, params=params)
+        assert response.status_code == 200
+        assert len(response.json()) <= 2, (
+            'Размер страницы не должен превышать значение `limit`.'
+        )
+        names.extend(project['name'] for project in response.json())
+        cursor = response.headers.get('X-Next-Cursor')
+    assert names == [f'page_{number}' for number in range(5)], (
+        'Страницы, полученные по курсорам из заголовка `X-Next-Cursor`, '
+        'должны содержать все проекты по порядку и без повторов.'
+    )
+    assert cursor is None, (
+        'На последней странице заголовок `X-Next-Cursor` не передаётся.'
+    )
+
+
+def test_get_charity_projects_by_ids(user_client, superuser_client):
+    superuser_client.post(PROJECTS_URL + 'batch', json=[
+        {'name': f'ids_{number}', 'description': 'Ids', 'full_amount': 10}
+        for number in range(3)
+    ])
+    response = user_client.get(
+        PROJECTS_URL,
+        params={'ids': '3,1,999,3', 'fields': 'name', 'limit': 1},
+    )
+    assert response.status_code == 200
+    assert response.json() == [
+        {'id': 3, 'name': 'ids_2'},
+        {'id': 1, 'name': 'ids_0'},
+    ], (
+        'Проекты из `ids` должны возвращаться в порядке запроса без '
+        'повторов и без учёта `limit`.'
+    )
+    assert response.headers.get('X-Missing-Ids') == '999', (
+        'Ненайденные id должны передаваться в заголовке `X-Missing-Ids`.'
+    )
+    response = user_client.get(PROJECTS_URL, params={'ids': '1'})
+    assert 'X-Missing-Ids' not in response.headers
+
+
+@pytest.mark.parametrize('ids, status_code', [
+    ('1,,2', 422),
+    ('a', 422),
+    (','.join(map(str, range(1, 1002))), 400),
+])
+def test_get_charity_projects_invalid_ids(user_client, ids, status_code):
+    response = user_client.get(PROJECTS_URL, params={'ids': ids})
+    assert response.status_code == status_code, (
+        f'GET-запрос к эндпоинту `{PROJECTS_URL}` с некорректным `ids` '
+        f'должен вернуть ответ со статус-кодом {status_code}.'
+    )
+
+
+@pytest.mark.parametrize('params, status_code', [
+    ({'cursor': 'not-a-cursor'}, 400),
+    ({'cursor': 'eyJpZCI6ICJ4In0='}, 400),
+    ({'limit': 0}, 422),
+    ({'limit': 1001}, 422),
+])
+def test_get_charity_projects_invalid_page(user_client, params, status_code):
+    response = user_client.get(PROJECTS_URL, params=params)
+    assert response.status_code == status_code, (
+        f'GET-запрос к эндпоинту `{PROJECTS_URL}` с параметрами {params} '
+        f'должен вернуть ответ со статус-кодом {status_code}.'
+    )
+
+
+@pytest.mark.usefixtures('charity_project')
+def test_get_charity_projects_sparse_fields(user_client):
+    statements = []
+
+    def on_execute(conn, cursor, statement, *args):
+        statements.append(statement)
+
+    event.listen(engine.sync_engine, 'before_cursor_execute', on_execute)
+    try:
+        response = user_client.get(
+            PROJECTS_URL, params={'fields': 'name,invested_amount'}
+        )
+    finally:
+        event.remove(
+            engine.sync_engine, 'before_cursor_execute', on_execute
+        )
+    assert response.json() == [
+        {'name': 'chimichangas4life', 'id': 1, 'invested_amount': 0}
+    ], (
+        f'GET-запрос к эндпоинту `{PROJECTS_URL}` с параметром `fields` '
+        'должен возвращать только перечисленные поля и `id`.'
+    )
+    assert not any('description' in statement for statement in statements), (
+        'Поля, не перечисленные в `fields`, не должны читаться из БД.'
+    )
+
+
+@pytest.mark.parametrize('fields', ['name,unknown', ',', 'user_id'])
+def test_get_charity_projects_unknown_fields(user_client, fields):
+    response = user_client.get(PROJECTS_URL, params={'fields': fields})
+    assert response.status_code == 400, (
+        f'GET-запрос к эндпоинту `{PROJECTS_URL}` с неизвестными полями '
+        'в `fields` должен вернуть ответ со статус-кодом 400.'
+    )
+
+
+def test_get_charity_projects_filtered_and_ordered(superuser_client):
+    superuser_client.post(PROJECTS_URL + 'batch', json=[
+        {'name': name, 'description': 'Filter', 'full_amount': amount}
+        for name, amount in (
+            ('first', 100), ('second', 30), ('third', 60), ('fourth', 10)
+        )
+    ])
+    superuser_client.post('/donation/', json={'full_amount': 100})
+    names = []
+    cursor = None
+    while True:
+        params = {
+            'fully_invested': False,
+            'max_remaining': 50,
+            'ordering': '-remaining',
+            'limit': 1,
+        }
+        if cursor:
+            params['cursor'] = cursor
+        response = superuser_client.get(PROJECTS_URL, params=params)
+        assert response.status_code == 200, response.json()
+        names.extend(project['name'] for project in response.json())
+        cursor = response.headers.get('X-Next-Cursor')
+        if cursor is None:
+            break
+    assert names == ['second', 'fourth'], (
+        f'GET-запрос к эндпоинту `{PROJECTS_URL}` с фильтрами должен '
+        'возвращать только подходящие проекты в заданном порядке, '
+        'в том числе при переходе по страницам.'
+    )
+
+
+@pytest.mark.parametrize('params', [
+    {'ordering': 'name'},
+    {'min_remaining': -1},
+    {'created_after': 'yesterday'},
+])
+def test_get_charity_projects_invalid_filters(user_client, params):
+    response = user_client.get(PROJECTS_URL, params=params)
+    assert response.status_code == 422, (
+        f'GET-запрос к эндпоинту `{PROJECTS_URL}` с параметрами {params} '
+        'должен вернуть ответ со статус-кодом 422.'
+    )
+
+
+def test_get_charity_project_details(user_client, charity_project):
+    response = user_client.get(
+        PROJECT_DETAILS_URL.format(project_id=charity_project.id)
+    )
+    assert response.status_code == 200, (
+        f'GET-запрос к эндпоинту `{PROJECT_DETAILS_URL}` должен вернуть '
+        'ответ со статус-кодом 200.'
+    )
+    assert response.json() == user_client.get(PROJECTS_URL).json()[0], (
+        f'Ответ на GET-запрос к эндпоинту `{PROJECT_DETAILS_URL}` должен '
+        'совпадать с проектом из списка проектов.'
+    )
+    response = user_client.get(PROJECT_DETAILS_URL.format(project_id=999))
+    assert response.status_code == 404, (
+        f'GET-запрос к эндпоинту `{PROJECT_DETAILS_URL}` для '
+        'несуществующего проекта должен вернуть ответ со статус-кодом 404.'
+    )
+
+
+def test_get_charity_project_details_cache(
+    superuser_client, charity_project, monkeypatch
+):
+    monkeypatch.setattr(object_cache, 'ttl', 60)
+    url = PROJECT_DETAILS_URL.format(project_id=charity_project.id)
+    assert superuser_client.get(url).json()['invested_amount'] == 0
+    with create_engine(f'sqlite:///{TEST_DB}').begin() as conn:
+        conn.execute(update(CharityProject).values(invested_amount=50))
+    assert superuser_client.get(url).json()['invested_amount'] == 0, (
+        'Пока кеш объектов действителен, проект должен отдаваться из него.'
+    )
+    superuser_client.post(PROJECTS_URL, json={
+        'name': 'cache', 'description': 'Cache', 'full_amount': 10
+    })
+    assert superuser_client.get(url).json()['invested_amount'] == 50, (
+        'После записи через приложение кеш объектов должен сбрасываться.'
+    )
+
+
+def test_get_charity_projects_listing_cache(
+    superuser_client, charity_project, monkeypatch
+):
+    monkeypatch.setattr(listing_cache, 'ttl', 60)
+    monkeypatch.setattr(listing_cache, 'maxsize', 1)
+    stats = listing_cache.stats()
+    params = {'fields': 'invested_amount'}
+    response = superuser_client.get(PROJECTS_URL, params=params)
+    assert response.json()[0]['invested_amount'] == 0
+    etag = response.headers['ETag']
+    with create_engine(f'sqlite:///{TEST_DB}').begin() as conn:
+        conn.execute(update(CharityProject).values(invested_amount=50))
+    statements = []
+
+    def on_execute(conn, cursor, statement, *args):
+        statements.append(statement)
+
+    event.listen(engine.sync_engine, 'before_cursor_execute', on_execute)
+    try:
+        response = superuser_client.get(PROJECTS_URL, params=params)
+    finally:
+        event.remove(
+            engine.sync_engine, 'before_cursor_execute', on_execute
+        )
+    assert not statements, (
+        'Ответ из кеша списка должен отдаваться без запросов к БД.'
+    )
+    assert response.json()[0]['invested_amount'] == 0, (
+        'Пока кеш списка действителен, ответ должен отдаваться из него.'
+    )
+    assert response.headers['ETag'] == etag, (
+        'Ответ из кеша списка должен отдаваться с ETag, '
+        'по которому он был прочитан.'
+    )
+    assert listing_cache.hits == stats['hits'] + 1
+    assert listing_cache.misses == stats['misses'] + 1
+    superuser_client.get(PROJECTS_URL, params={'fields': 'name'})
+    assert superuser_client.get(
+        PROJECTS_URL, params=params
+    ).json()[0]['invested_amount'] == 50, (
+        'При переполнении кеша списка давно запрошенные ответы '
+        'должны вытесняться.'
+    )
+    superuser_client.post(PROJECTS_URL, json={
+        'name': 'cache', 'description': 'Cache', 'full_amount': 10
+    })
+    assert len(superuser_client.get(PROJECTS_URL, params=params).json()) == 2, (
+        'После записи через приложение кеш списка должен сбрасываться.'
+    )
+
+
+def test_get_charity_projects_not_modified(superuser_client, charity_project):
+    response = superuser_client.get(PROJECTS_URL, params={'limit': 10})
+    etag = response.headers.get('ETag')
+    assert etag, f'Ответ эндпоинта `{PROJECTS_URL}` должен содержать `ETag`.'
+    response = superuser_client.get(
+        PROJECTS_URL,
+        params={'limit': 10},
+        headers={'If-None-Match': f'"other", W/{etag}'},
+    )
+    assert response.status_code == 304, (
+        'С совпадающим `If-None-Match` список проектов должен вернуть '
+        'ответ со статус-кодом 304.'
+    )
+    assert response.content == b''
+    assert superuser_client.get(
+        PROJECTS_URL, params={'limit': 5}, headers={'If-None-Match': etag}
+    ).status_code == 200, 'ETag должен зависеть от параметров запроса.'
+    superuser_client.patch(
+        PROJECTS_URL + str(charity_project.id), json={'name': 'renamed'}
+    )
+    response = superuser_client.get(
+        PROJECTS_URL, params={'limit': 10}, headers={'If-None-Match': etag}
+    )
+    assert response.status_code == 200, (
+        'После изменения проекта ETag списка должен измениться.'
+    )
+    assert response.json()[0]['name'] == 'renamed'
+    etag = response.headers['ETag']
+    with create_engine(f'sqlite:///{TEST_DB}').begin() as conn:
+        conn.execute(update(CharityProject).values(invested_amount=50))
+    response = superuser_client.get(
+        PROJECTS_URL, params={'limit': 10}, headers={'If-None-Match': etag}
+    )
+    assert response.status_code == 200, (
+        'После распределения средств другим процессом ETag списка '
+        'должен измениться.'
+    )
+    assert response.json()[0]['invested_amount'] == 50
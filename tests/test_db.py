@@ -1,4 +1,8 @@
-from conftest import BASE_DIR
+import pytest
+from conftest import BASE_DIR, engine
+from sqlalchemy import event, select, text
+
+from app.models import CharityProject, Donation
 
 
 try:
@@ -38,3 +42,102 @@ def test_check_db_url():
                 'Укажите значение по умолчанию для подключения базы данных '
                 'sqlite '
             )
+
+
+@pytest.mark.parametrize('model', [CharityProject, Donation])
+async def test_open_funds_query_uses_index(model):
+    query = (
+        select(model)
+        .where(model.fully_invested.is_(False))
+        .order_by(model.create_date, model.id)
+    )
+    compiled = query.compile(
+        dialect=engine.dialect, compile_kwargs={'literal_binds': True}
+    )
+    async with engine.connect() as conn:
+        plan = await conn.execute(text(f'EXPLAIN QUERY PLAN {compiled}'))
+        details = ' '.join(row.detail for row in plan)
+    index_name = f'ix_{model.__tablename__}_open_funds'
+    assert index_name in details, (
+        'Запрос очереди открытых объектов должен использовать индекс '
+        f'`{index_name}`. План запроса: {details}'
+    )
+    assert 'TEMP B-TREE' not in details, (
+        'Сортировка очереди открытых объектов по `create_date` должна '
+        f'выполняться по индексу. План запроса: {details}'
+    )
+
+
+@pytest.mark.parametrize('client_name, method, url, json_data', [
+    (
+        'superuser_client',
+        'post',
+        '/charity_project/',
+        {'name': 'Returning', 'description': 'Desc', 'full_amount': 10},
+    ),
+    (
+        'superuser_client',
+        'post',
+        '/charity_project/batch',
+        [{'name': 'Returning', 'description': 'Desc', 'full_amount': 10}],
+    ),
+    ('superuser_client', 'patch', '/charity_project/1', {'full_amount': 10}),
+    ('user_client', 'post', '/donation/', {'full_amount': 10}),
+    ('user_client', 'post', '/donation/batch', [{'full_amount': 10}]),
+])
+def test_writes_do_not_reread_after_commit(
+    request, charity_project, client_name, method, url, json_data
+):
+    client = request.getfixturevalue(client_name)
+    events = []
+
+    def on_execute(conn, cursor, statement, *args):
+        events.append(statement)
+
+    def on_commit(conn):
+        events.append('COMMIT')
+
+    event.listen(engine.sync_engine, 'before_cursor_execute', on_execute)
+    event.listen(engine.sync_engine, 'commit', on_commit)
+    try:
+        response = getattr(client, method)(url, json=json_data)
+    finally:
+        event.remove(
+            engine.sync_engine, 'before_cursor_execute', on_execute
+        )
+        event.remove(engine.sync_engine, 'commit', on_commit)
+    assert response.status_code == 200, response.json()
+    assert events.count('COMMIT') == 1, (
+        f'Запрос `{method.upper()} {url}` должен выполняться одной '
+        'транзакцией.'
+    )
+    after_commit = events[events.index('COMMIT') + 1:]
+    assert not after_commit, (
+        f'После коммита запроса `{method.upper()} {url}` записанные объекты '
+        'не должны перечитываться из БД. Выполнены запросы: '
+        f'{after_commit}'
+    )
+
+
+async def test_open_projects_by_remaining_use_index():
+    remaining = CharityProject.full_amount - CharityProject.invested_amount
+    query = (
+        select(CharityProject)
+        .where(CharityProject.fully_invested.is_(False), remaining <= 50)
+        .order_by(remaining.desc(), CharityProject.id.desc())
+        .limit(10)
+    )
+    compiled = query.compile(
+        dialect=engine.dialect, compile_kwargs={'literal_binds': True}
+    )
+    async with engine.connect() as conn:
+        plan = await conn.execute(text(f'EXPLAIN QUERY PLAN {compiled}'))
+        details = ' '.join(row.detail for row in plan)
+    assert 'ix_charityproject_open_remaining' in details, (
+        'Открытые проекты по остатку должны читаться по индексу '
+        f'`ix_charityproject_open_remaining`. План запроса: {details}'
+    )
+    assert 'TEMP B-TREE' not in details, (
+        'Сортировка открытых проектов по остатку должна выполняться '
+        f'по индексу. План запроса: {details}'
+    )
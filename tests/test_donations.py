@@ -1,7 +1,20 @@
+import asyncio
+import json
 import time
 from datetime import datetime
 
 import pytest
+from conftest import TestingSessionLocal, engine
+from sqlalchemy import event
+
+from app.core import serialization
+from app.core.config import settings
+from app.models import CharityProject, User
+from app.schemas import DonationBase
+from app.services.cache import read_flights
+from app.services.donation import DonationService
+from app.services.group_commit import group_commit_writer
+from app.services.ledger import funds_ledger
 
 DONATIONS_URL = '/donation/'
 DONATON_DETAILS_URL = DONATIONS_URL + '{donation_id}'
@@ -221,3 +234,377 @@ def test_create_donation_check_create_date(user_client):
         'Убедитесь, что при неодновременном создании двух пожертвований '
         'у них отличаются значения в поле `create_date`.'
     )
+
+
+async def test_donation_created_and_invested_in_one_commit(mixer):
+    mixer.blend(
+        'app.models.charity_project.CharityProject',
+        name='unit_of_work',
+        description='Unit of work',
+        full_amount=100,
+        invested_amount=0,
+        fully_invested=False,
+    )
+    commits = []
+
+    def count_commit(conn):
+        commits.append(conn)
+
+    event.listen(engine.sync_engine, 'commit', count_commit)
+    try:
+        async with TestingSessionLocal() as session:
+            donation = await DonationService.create_donation(
+                DonationBase(full_amount=30),
+                CharityProject,
+                session,
+                User(id=2),
+            )
+    finally:
+        event.remove(engine.sync_engine, 'commit', count_commit)
+    assert len(commits) == 1, (
+        'Создание пожертвования и распределение средств должны '
+        'сохраняться одной транзакцией.'
+    )
+    assert donation.fully_invested, (
+        'Пожертвование должно быть распределено в той же транзакции, '
+        'в которой создано.'
+    )
+
+
+async def test_group_commit_applies_concurrent_donations_at_once(mixer):
+    project = mixer.blend(
+        'app.models.charity_project.CharityProject',
+        name='group_commit',
+        description='Group commit',
+        full_amount=100,
+        invested_amount=0,
+        fully_invested=False,
+    )
+    commits = []
+
+    def count_commit(conn):
+        commits.append(conn)
+
+    async def donate(full_amount):
+        async with TestingSessionLocal() as session:
+            return await DonationService.create_donation(
+                DonationBase(full_amount=full_amount),
+                CharityProject,
+                session,
+                User(id=2),
+            )
+
+    event.listen(engine.sync_engine, 'commit', count_commit)
+    group_commit_writer.start()
+    try:
+        donations = await asyncio.gather(
+            *(donate(full_amount) for full_amount in (30, 30, 60))
+        )
+    finally:
+        await group_commit_writer.stop()
+        event.remove(engine.sync_engine, 'commit', count_commit)
+    assert len(commits) == 1, (
+        'Одновременные пожертвования в режиме группового коммита должны '
+        'сохраняться одной транзакцией.'
+    )
+    assert [donation.invested_amount for donation in donations] == [
+        30, 30, 40
+    ], (
+        'Каждый запрос должен получить своё пожертвование, распределённое '
+        'в порядке поступления.'
+    )
+    assert project.fully_invested, (
+        'Пачка пожертвований должна полностью закрыть проект.'
+    )
+
+
+async def test_group_commit_retries_ledger_out_of_sync(mixer, monkeypatch):
+    monkeypatch.setattr(settings, 'allocation_engine', 'ledger')
+    funds_ledger.invalidate()
+    project = mixer.blend(
+        'app.models.charity_project.CharityProject',
+        name='group_commit_ledger',
+        description='Group commit',
+        full_amount=100,
+        invested_amount=0,
+        fully_invested=False,
+    )
+    write = funds_ledger.write
+    stale_writes = [False, False]
+
+    async def write_once_stale(plan, session):
+        if stale_writes:
+            return stale_writes.pop()
+        return await write(plan, session)
+
+    async def donate(full_amount):
+        async with TestingSessionLocal() as session:
+            return await DonationService.create_donation(
+                DonationBase(full_amount=full_amount),
+                CharityProject,
+                session,
+                User(id=2),
+            )
+
+    monkeypatch.setattr(funds_ledger, 'write', write_once_stale)
+    group_commit_writer.start()
+    try:
+        donations = await asyncio.gather(
+            *(donate(full_amount) for full_amount in (30, 30, 60))
+        )
+    finally:
+        await group_commit_writer.stop()
+    assert [donation.invested_amount for donation in donations] == [
+        30, 30, 40
+    ], (
+        'Если очереди в памяти разошлись с БД, операция группового '
+        'коммита должна повториться по перечитанным очередям.'
+    )
+    mixer.params['session'].refresh(project)
+    assert project.invested_amount == 100
+
+
+def test_create_donations_batch(user_client, charity_project,
+                                charity_project_nunchaku):
+    response = user_client.post(DONATIONS_URL + 'batch', json=[
+        {'full_amount': 600000, 'comment': 'first'},
+        {'full_amount': 600000},
+        {'full_amount': 10},
+    ])
+    assert response.status_code == 200, (
+        f'Корректный POST-запрос к эндпоинту `{DONATIONS_URL}batch` должен '
+        'возвращать ответ со статус-кодом 200.'
+    )
+    data = response.json()
+    assert [donation['full_amount'] for donation in data] == [
+        600000, 600000, 10
+    ], 'Пожертвования пачки должны возвращаться в порядке запроса.'
+    assert [donation['id'] for donation in data] == [1, 2, 3]
+    assert data[0]['comment'] == 'first'
+    assert {'id', 'full_amount', 'create_date'} <= data[1].keys()
+    assert charity_project.fully_invested, (
+        'Пачка пожертвований должна распределяться по проектам в порядке '
+        'создания.'
+    )
+    assert charity_project_nunchaku.invested_amount == 200010, (
+        'Пачка пожертвований должна распределяться по проектам в порядке '
+        'создания.'
+    )
+
+
+def test_create_donations_batch_single_insert(user_client, donation):
+    inserts = []
+
+    def count_insert(conn, cursor, statement, *args):
+        if statement.lstrip().upper().startswith('INSERT'):
+            inserts.append(statement)
+
+    event.listen(engine.sync_engine, 'before_cursor_execute', count_insert)
+    try:
+        response = user_client.post(DONATIONS_URL + 'batch', json=[
+            {'full_amount': amount} for amount in (10, 20, 30)
+        ])
+    finally:
+        event.remove(
+            engine.sync_engine, 'before_cursor_execute', count_insert
+        )
+    assert len(inserts) == 1, (
+        'Пачка пожертвований должна вставляться одним запросом.'
+    )
+    assert [item['id'] for item in response.json()] == [
+        donation.id + 1, donation.id + 2, donation.id + 3
+    ]
+    assert [item['full_amount'] for item in response.json()] == [10, 20, 30]
+
+
+@pytest.mark.parametrize('json_data', [
+    [],
+    [{'full_amount': 10}, {'full_amount': -1}],
+    {'full_amount': 10},
+])
+def test_create_donations_batch_invalid(user_client, json_data):
+    response = user_client.post(DONATIONS_URL + 'batch', json=json_data)
+    assert response.status_code == 422, (
+        f'Некорректный POST-запрос к эндпоинту `{DONATIONS_URL}batch` '
+        'должен вернуть статус-код 422.'
+    )
+
+
+def test_get_user_donations_by_pages(user_client):
+    user_client.post(DONATIONS_URL + 'batch', json=[
+        {'full_amount': amount} for amount in (10, 20, 30)
+    ])
+    first_page = user_client.get(MY_DONATIONS_URL, params={'limit': 2})
+    cursor = first_page.headers.get('X-Next-Cursor')
+    assert cursor, (
+        f'Если у GET-запроса к `{MY_DONATIONS_URL}` есть следующая '
+        'страница, её курсор передаётся в заголовке `X-Next-Cursor`.'
+    )
+    second_page = user_client.get(
+        MY_DONATIONS_URL, params={'limit': 2, 'cursor': cursor}
+    )
+    assert [
+        donation['full_amount']
+        for donation in first_page.json() + second_page.json()
+    ] == [10, 20, 30], (
+        'Страницы пожертвований пользователя должны идти по порядку '
+        'и без повторов.'
+    )
+    assert 'X-Next-Cursor' not in second_page.headers
+
+
+@pytest.mark.usefixtures('donation', 'another_donation')
+def test_export_donations(superuser_client):
+    expected = superuser_client.get(DONATIONS_URL).json()
+    response = superuser_client.get(DONATIONS_URL + 'export')
+    assert response.status_code == 200
+    assert response.headers['content-type'] == 'application/x-ndjson'
+    assert [
+        json.loads(line) for line in response.text.splitlines()
+    ] == expected, (
+        f'Выгрузка `{DONATIONS_URL}export` в формате NDJSON должна '
+        'содержать по одному пожертвованию на строку, как в списке '
+        'пожертвований.'
+    )
+    response = superuser_client.get(
+        DONATIONS_URL + 'export', params={'format': 'json'}
+    )
+    assert response.json() == expected, (
+        f'Выгрузка `{DONATIONS_URL}export?format=json` должна совпадать '
+        'со списком пожертвований.'
+    )
+
+
+def test_export_donations_usual_user(user_client):
+    response = user_client.get(DONATIONS_URL + 'export')
+    assert response.status_code == 403, (
+        f'GET-запрос пользователя к эндпоинту `{DONATIONS_URL}export` '
+        'должен вернуть ответ со статус-кодом 403.'
+    )
+
+
+@pytest.mark.usefixtures('donation', 'another_donation')
+def test_get_all_donations_without_orjson(superuser_client, monkeypatch):
+    expected = superuser_client.get(DONATIONS_URL).json()
+    monkeypatch.setattr(serialization, 'orjson', None)
+    assert superuser_client.get(DONATIONS_URL).json() == expected, (
+        'Без установленного `orjson` список пожертвований должен '
+        'сериализоваться стандартным модулем `json` так же.'
+    )
+
+
+def test_get_donations_by_ids(superuser_client, donation, another_donation):
+    params = {'ids': f'{another_donation.id},999,{donation.id}'}
+    response = superuser_client.get(DONATIONS_URL, params=params)
+    assert response.status_code == 200
+    assert [obj['id'] for obj in response.json()] == [
+        another_donation.id, donation.id
+    ], 'Пожертвования из `ids` должны возвращаться в порядке запроса.'
+    assert response.headers.get('X-Missing-Ids') == '999', (
+        'Ненайденные id должны передаваться в заголовке `X-Missing-Ids`.'
+    )
+
+
+def test_get_user_donations_not_modified(user_client, donation):
+    etag = user_client.get(MY_DONATIONS_URL).headers.get('ETag')
+    assert etag, (
+        f'Ответ эндпоинта `{MY_DONATIONS_URL}` должен содержать `ETag`.'
+    )
+    response = user_client.get(
+        MY_DONATIONS_URL, headers={'If-None-Match': etag}
+    )
+    assert response.status_code == 304, (
+        'С совпадающим `If-None-Match` список пожертвований должен вернуть '
+        'ответ со статус-кодом 304.'
+    )
+    user_client.post(DONATIONS_URL, json={'full_amount': 10})
+    response = user_client.get(
+        MY_DONATIONS_URL, headers={'If-None-Match': etag}
+    )
+    assert response.status_code == 200, (
+        'После нового пожертвования ETag списка должен измениться.'
+    )
+    assert len(response.json()) == 2
+
+
+async def test_concurrent_donation_listings_share_one_query(
+    donation, another_donation
+):
+    queries = []
+
+    def count_query(conn, cursor, statement, *args):
+        if statement.lstrip().upper().startswith('SELECT'):
+            queries.append(statement)
+
+    async def get_donations():
+        async with TestingSessionLocal() as session:
+            return await DonationService.get_all_donations(session)
+
+    stats = read_flights.stats()
+    event.listen(engine.sync_engine, 'before_cursor_execute', count_query)
+    try:
+        pages = await asyncio.gather(*(get_donations() for _ in range(5)))
+    finally:
+        event.remove(
+            engine.sync_engine, 'before_cursor_execute', count_query
+        )
+    assert len(queries) == 1, (
+        'Одновременные одинаковые запросы списка пожертвований должны '
+        'выполнять один запрос к БД.'
+    )
+    assert all(page == pages[0] for page in pages)
+    assert read_flights.calls == stats['calls'] + 5
+    assert read_flights.coalesced == stats['coalesced'] + 4
+    assert read_flights.stats()['in_flight'] == 0
+
+
+async def test_coalesced_donation_listing_survives_leader_cancel(
+    donation, another_donation
+):
+    async def get_donations():
+        async with TestingSessionLocal() as session:
+            return await DonationService.get_all_donations(session)
+
+    leader = asyncio.ensure_future(get_donations())
+    await asyncio.sleep(0)
+    follower = asyncio.ensure_future(get_donations())
+    await asyncio.sleep(0)
+    leader.cancel()
+    donations, _ = await follower
+    assert len(donations) == 2, (
+        'Отмена первого запроса и закрытие его сессии не должны '
+        'прерывать общее чтение для остальных.'
+    )
+
+
+def test_get_metrics(superuser_client):
+    response = superuser_client.get('/metrics')
+    assert response.status_code == 200
+    assert set(response.json()) == {
+        'object_cache', 'listing_cache', 'read_flights', 'user_cache', 'boot'
+    }
+    assert 'coalescing_ratio' in response.json()['read_flights']
+
+
+def test_get_metrics_usual_user(user_client):
+    assert user_client.get('/metrics').status_code == 403
+
+
+def test_get_donation_details(user_client, donation, another_donation):
+    response = user_client.get(
+        DONATON_DETAILS_URL.format(donation_id=donation.id)
+    )
+    assert response.status_code == 200, (
+        f'GET-запрос владельца к эндпоинту `{DONATON_DETAILS_URL}` должен '
+        'вернуть ответ со статус-кодом 200.'
+    )
+    assert response.json()['comment'] == 'To you for chimichangas'
+    for donation_id in (another_donation.id, 999):
+        response = user_client.get(
+            DONATON_DETAILS_URL.format(donation_id=donation_id)
+        )
+        assert response.status_code == 404, (
+            f'GET-запрос к эндпоинту `{DONATON_DETAILS_URL}` для чужого или '
+            'несуществующего пожертвования должен вернуть ответ '
+            'со статус-кодом 404.'
+        )
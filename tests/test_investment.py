@@ -1,4 +1,18 @@
+import asyncio
+import random
+
 import pytest
+from conftest import (
+    TEST_DB, TestingSessionLocal, app, current_superuser, engine
+)
+from fixtures.user import superuser
+from sqlalchemy import create_engine, delete, event, func, select
+from sqlalchemy.exc import OperationalError
+
+from app.core.config import settings
+from app.models import CharityProject, Donation
+from app.services.allocation_worker import allocation_worker
+from app.services.ledger import funds_ledger
 
 DONATION_URL = '/donation/'
 PROJECTS_URL = '/charity_project/'
@@ -60,3 +74,228 @@ def test_donation_to_little_invest_project(
     )
     assert not charity_project_nunchaku.fully_invested, common_asser_msg
     assert charity_project_nunchaku.invested_amount == 0, common_asser_msg
+
+
+def test_investment_reads_projects_in_chunks(user_client, mixer, monkeypatch):
+    monkeypatch.setattr(settings, 'allocation_chunk_size', 2)
+    projects = [
+        mixer.blend(
+            'app.models.charity_project.CharityProject',
+            name=f'project_{number}',
+            description='Chunked project',
+            full_amount=100,
+            invested_amount=0,
+            fully_invested=False,
+        )
+        for number in range(5)
+    ]
+    user_client.post(DONATION_URL, json={'full_amount': 350})
+    common_asser_msg = (
+        'Пожертвование должно распределяться по открытым проектам в порядке '
+        'создания, даже если проекты читаются из БД порциями.'
+    )
+    assert [project.invested_amount for project in projects] == [
+        100, 100, 100, 50, 0
+    ], common_asser_msg
+    assert [project.fully_invested for project in projects] == [
+        True, True, True, False, False
+    ], common_asser_msg
+
+
+@pytest.mark.parametrize('allocation_engine', ['orm', 'sql', 'ledger'])
+def test_allocation_engines_give_same_result(
+    superuser_client, mixer, monkeypatch, allocation_engine
+):
+    monkeypatch.setattr(settings, 'allocation_engine', allocation_engine)
+    funds_ledger.invalidate()
+    donations = [
+        mixer.blend(
+            'app.models.donation.Donation',
+            user_id=2,
+            full_amount=full_amount,
+            invested_amount=invested_amount,
+            fully_invested=False,
+        )
+        for full_amount, invested_amount in ((100, 60), (30, 0), (50, 0))
+    ]
+    response = superuser_client.post(PROJECTS_URL, json={
+        'name': 'Engines', 'description': 'Engines', 'full_amount': 60,
+    })
+    data = response.json()
+    common_asser_msg = (
+        f'Движок распределения `{allocation_engine}` должен закрыть первые '
+        'пожертвования очереди и частично заполнить следующее.'
+    )
+    assert data['invested_amount'] == 60, common_asser_msg
+    assert data['fully_invested'], common_asser_msg
+    assert [donation.invested_amount for donation in donations] == [
+        100, 20, 0
+    ], common_asser_msg
+    assert [donation.fully_invested for donation in donations] == [
+        True, False, False
+    ], common_asser_msg
+    response = superuser_client.post(PROJECTS_URL, json={
+        'name': 'Engines 2', 'description': 'Engines', 'full_amount': 100,
+    })
+    data = response.json()
+    assert data['invested_amount'] == 60, common_asser_msg
+    assert not data['fully_invested'], common_asser_msg
+
+
+def test_ledger_detects_changes_made_behind_it(
+    user_client, mixer, monkeypatch
+):
+    monkeypatch.setattr(settings, 'allocation_engine', 'ledger')
+    funds_ledger.invalidate()
+    first, second = [
+        mixer.blend(
+            'app.models.charity_project.CharityProject',
+            name=f'ledger_{number}',
+            description='Ledger project',
+            full_amount=100,
+            invested_amount=0,
+            fully_invested=False,
+        )
+        for number in range(2)
+    ]
+    user_client.post(DONATION_URL, json={'full_amount': 10})
+    first.invested_amount = 100
+    first.fully_invested = True
+    mixer.params['session'].commit()
+    user_client.post(DONATION_URL, json={'full_amount': 30})
+    common_asser_msg = (
+        'Если очередь в памяти разошлась с БД, распределение должно '
+        'выполниться по актуальным данным.'
+    )
+    assert first.invested_amount == 100, common_asser_msg
+    assert second.invested_amount == 30, common_asser_msg
+
+
+def test_ledger_survives_failed_commit(user_client, mixer, monkeypatch):
+    monkeypatch.setattr(settings, 'allocation_engine', 'ledger')
+    funds_ledger.invalidate()
+    projects = [
+        mixer.blend(
+            'app.models.charity_project.CharityProject',
+            name=f'ledger_{number}',
+            description='Ledger project',
+            full_amount=10,
+            invested_amount=0,
+            fully_invested=False,
+        )
+        for number in range(3)
+    ]
+    user_client.post(DONATION_URL, json={'full_amount': 1})
+
+    def fail_commit(conn):
+        event.remove(engine.sync_engine, 'commit', fail_commit)
+        raise OperationalError('COMMIT', {}, Exception('database is locked'))
+
+    event.listen(engine.sync_engine, 'commit', fail_commit)
+    with pytest.raises(OperationalError):
+        user_client.post(DONATION_URL, json={'full_amount': 9})
+    user_client.post(DONATION_URL, json={'full_amount': 9})
+    mixer.params['session'].expire_all()
+    assert [project.invested_amount for project in projects] == [
+        10, 0, 0
+    ], (
+        'После неудачного коммита распределение должно выполняться по '
+        'данным БД, а не по очередям в памяти.'
+    )
+    assert projects[0].fully_invested
+
+
+def _run_random_operations(client, seed):
+    rnd = random.Random(seed)
+    for number in range(40):
+        if rnd.random() < 0.2:
+            funds_ledger.invalidate()
+        size = rnd.choice((1, 1, 2, 4))
+        amounts = [rnd.randint(1, 20) for _ in range(size)]
+        if rnd.random() < 0.5:
+            projects = [
+                {
+                    'name': f'random_{number}_{index}',
+                    'description': 'Random',
+                    'full_amount': amount,
+                }
+                for index, amount in enumerate(amounts)
+            ]
+            if size == 1:
+                client.post(PROJECTS_URL, json=projects[0])
+            else:
+                client.post(PROJECTS_URL + 'batch', json=projects)
+        elif size == 1:
+            client.post(DONATION_URL, json={'full_amount': amounts[0]})
+        else:
+            client.post(DONATION_URL + 'batch', json=[
+                {'full_amount': amount} for amount in amounts
+            ])
+    with create_engine(f'sqlite:///{TEST_DB}').begin() as conn:
+        rows = {
+            model: conn.execute(
+                select(
+                    model.id, model.invested_amount, model.fully_invested
+                ).order_by(model.id)
+            ).all()
+            for model in (CharityProject, Donation)
+        }
+        totals = [
+            conn.execute(select(func.sum(model.invested_amount))).scalar()
+            for model in (CharityProject, Donation)
+        ]
+        for model in (CharityProject, Donation):
+            conn.execute(delete(model))
+    return rows, totals
+
+
+@pytest.mark.parametrize('seed', [10, 11, 33])
+def test_ledger_matches_orm_on_random_operations(
+    user_client, monkeypatch, seed
+):
+    monkeypatch.setitem(
+        app.dependency_overrides, current_superuser, lambda: superuser
+    )
+    results = {}
+    for allocation_engine in ('orm', 'ledger'):
+        monkeypatch.setattr(settings, 'allocation_engine', allocation_engine)
+        funds_ledger.invalidate()
+        results[allocation_engine] = _run_random_operations(
+            user_client, seed
+        )
+        project_total, donation_total = results[allocation_engine][1]
+        assert project_total == donation_total, (
+            f'Движок `{allocation_engine}` должен вложить в проекты столько '
+            'же, сколько списано с пожертвований.'
+        )
+    assert results['ledger'] == results['orm'], (
+        'Движок `ledger` должен распределять средства так же, как `orm`.'
+    )
+
+
+def test_background_allocation_mode(user_client, charity_project, monkeypatch):
+    monkeypatch.setattr(settings, 'allocation_mode', 'background')
+    response = user_client.post(DONATION_URL, json={'full_amount': 100})
+    assert response.status_code == 202, (
+        'В фоновом режиме распределения создание пожертвования должно '
+        'возвращать статус-код 202.'
+    )
+    status_url = f'{DONATION_URL}{response.json()["id"]}/allocation'
+    assert user_client.get(status_url).json()['allocation_pending'], (
+        'До работы воркера пожертвование должно ожидать распределения.'
+    )
+
+    async def process_pending():
+        async with TestingSessionLocal() as session:
+            return await allocation_worker.process_pending(session)
+
+    assert asyncio.run(process_pending()) == 1
+    assert user_client.get(status_url).json() == {
+        'id': response.json()['id'],
+        'invested_amount': 100,
+        'fully_invested': True,
+        'allocation_pending': False,
+    }, 'Воркер должен распределить ожидающее пожертвование.'
+    assert charity_project.invested_amount == 100, (
+        'Воркер должен распределить ожидающее пожертвование.'
+    )